@@ -1,27 +1,72 @@
+import argparse
 import asyncio
+import ipaddress
 import json
 import time
 import threading
-from typing import Set, Any
+from collections import deque
+from dataclasses import dataclass
+from http import HTTPStatus
+from typing import Dict, Any
 from server.playerHandler import PlayerHandler
+from server.ratelimit import TokenBucket
+from server.shard import SHARD_MAPS, ShardRouter
+from server import protocol
+from server.metrics import METRICS
+from server.broadcast import PLAYERS_DELTA, PLAYERS_UPDATE, diff_players, encode_players
 
 from websockets.asyncio.server import serve
 
 PORT = 8989
+# Clients interpolate between broadcasts, so 20 Hz still looks smooth
+BROADCAST_RATE = 20
 
 PLAYER_HANDLER = PlayerHandler()
-PLAYER_HANDLER.start()
+# Set by main() with --sharded, players then live in per-map worker processes
+SHARDS: ShardRouter | None = None
+
+# Map ids used in binary broadcasts, shared by every connection. The game's own
+# maps are interned up front so clients uploading junk names can't crowd them out
+MAP_IDS = protocol.MapTable()
+for _name in ("", *(name for names in SHARD_MAPS for name in names)):
+    MAP_IDS.intern(_name)
 
 # ------------------------------
 # Simple in-memory chat storage
 # ------------------------------
+@dataclass(frozen=True, slots=True)
+class ChatRecord:
+    id: int
+    sender: int
+    text: str
+    ts: float
+    json: str   # pre-serialized message, reused for every fan-out
+
+
+def chat_update_json(records: list[ChatRecord]) -> str:
+    """Build a chat_update frame from pre-serialized messages without re-encoding them"""
+    return '{"type": "chat_update", "messages": [' + ", ".join(r.json for r in records) + ']}'
+
+
 class ChatStore:
-    def __init__(self) -> None:
+    """Fixed-capacity ring buffer of chat messages.
+
+    Ids are handed out consecutively, so the slot of any id still in the
+    buffer is plain arithmetic from the oldest id and list_since costs only
+    the messages it returns, not the history length.
+    """
+    def __init__(self, capacity: int = 1000) -> None:
         self._lock = threading.Lock()
         self._next_id = 1
-        self._messages: list[dict] = []
+        self._capacity = capacity
+        self._ring: list[ChatRecord | None] = [None] * capacity
+        self._head = 0      # slot of the oldest message
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
 
-    def add(self, sender_id: int, text: str) -> dict:
+    def add(self, sender_id: int, text: str) -> ChatRecord:
         # Sanitize
         t = (text or "").strip()
         if len(t) > 200:
@@ -35,139 +80,406 @@ class ChatStore:
                 "text": t,
                 "ts": time.time(),
             }
-            self._messages.append(msg)
+            record = ChatRecord(msg["id"], sender_id, t, msg["ts"], json.dumps(msg))
+            # Overwrite the oldest slot once full to avoid unbounded growth
+            self._ring[(self._head + self._count) % self._capacity] = record
+            if self._count < self._capacity:
+                self._count += 1
+            else:
+                self._head = (self._head + 1) % self._capacity
             self._next_id += 1
-            # Keep only the last N to avoid unbounded growth
-            if len(self._messages) > 1000:
-                self._messages = self._messages[-800:]
-            return msg
+            return record
 
-    def list_since(self, since_id: int) -> list[dict]:
+    def list_since(self, since_id: int) -> list[ChatRecord]:
         with self._lock:
+            oldest_id = self._next_id - self._count
             if since_id <= 0:
-                return list(self._messages[-100:])  # cap response size
-            # Find first index with id > since_id
-            # Messages are appended in increasing id order
-            out: list[dict] = []
-            for m in self._messages:
-                if int(m.get("id", 0)) > since_id:
-                    out.append(m)
-            # Cap size
-            if len(out) > 200:
-                out = out[-200:]
-            return out
+                first_id = self._next_id - 100  # cap response size
+            else:
+                first_id = max(since_id + 1, self._next_id - 200)  # cap size
+            first_id = max(first_id, oldest_id)
+            return [
+                self._ring[(self._head + i) % self._capacity]
+                for i in range(first_id - oldest_id, self._count)
+            ]
 
 CHAT = ChatStore()
 
+# Frames a client may have waiting before it counts as a slow consumer
+MAX_PENDING_FRAMES = 32
+
+# Message types handle_client understands, the rest are counted together as "other"
+MESSAGE_TYPES = frozenset({"hello", "map_id", "player_update", "chat_send"})
+
+
+def message_kind(msg_type: Any) -> str:
+    """Metrics and rate limit key of a client message type, so junk types can't grow either"""
+    return msg_type if isinstance(msg_type, str) and msg_type in MESSAGE_TYPES else "other"
+
+
+# Token buckets per connection as (per second, burst). Every frame spends from
+# "any" before it is decoded, then from the bucket of its type. Unknown types
+# share the "other" bucket (see message_kind) instead of a fresh one each.
+RATE_LIMITS: Dict[str, tuple[float, float]] = {
+    "any": (120.0, 240.0),
+    "player_update": (40.0, 80.0),  # binary uploads share this bucket
+    "chat_send": (3.0, 10.0),
+}
+DEFAULT_RATE_LIMIT = (10.0, 20.0)
+
 # Track connected clients
-CONNECTED_CLIENTS: Set[Any] = set()
-CLIENTS_LOCK = asyncio.Lock()
+class ClientState:
+    """Broadcast bookkeeping and outbound queue for one connection.
+
+    Frames are queued with send() without waiting on the socket; a writer
+    task per connection drains the queue, so one slow client never stalls
+    the broadcast tick or anyone else's chat.
+    """
+    def __init__(self, websocket: Any) -> None:
+        self.websocket = websocket
+        self.player_id = -1
+        # Map from the client's latest upload, only tracked in sharded mode
+        self.map_name = ""
+        # Map whose players the client currently knows, None forces a full snapshot
+        self.synced_map: str | None = None
+        # Negotiated wire format for position frames
+        self.binary = False
+        # Server map ids the client has been told about
+        self.known_map_ids: set[int] = set()
+        # Map ids the client declared for its uploads
+        self.upload_maps: dict[int, str] = {}
+        # Inbound rate limits by message type, created on first use
+        self.buckets: Dict[str, TokenBucket] = {}
+        # (frame, is_position) pairs waiting for the writer
+        self._outbox: deque[tuple[str | bytes, bool]] = deque()
+        self._ready = asyncio.Event()
+        self._writer: asyncio.Task | None = None
+        self._closer: asyncio.Task | None = None
+
+    def map_id(self, name: str) -> int:
+        """Intern a map name, telling the client about new ids before they are used"""
+        map_id = MAP_IDS.intern(name)
+        if map_id not in self.known_map_ids:
+            self.send(json.dumps({"type": "map_ids", "maps": MAP_IDS.ids}))
+            self.known_map_ids = set(MAP_IDS.ids.values())
+        return map_id
+
+    @property
+    def queued(self) -> int:
+        return len(self._outbox)
+
+    def allow(self, kind: str) -> bool:
+        """Spend a token for an inbound message of this kind, "any" or a message_kind"""
+        bucket = self.buckets.get(kind)
+        if bucket is None:
+            bucket = self.buckets[kind] = TokenBucket(*RATE_LIMITS.get(kind, DEFAULT_RATE_LIMIT))
+        if bucket.take():
+            return True
+        METRICS.rate_limited[kind] += 1
+        return False
+
+    def start(self) -> None:
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def stop(self) -> None:
+        if self._writer:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+
+    def send(self, frame: str | bytes, *, position: bool = False) -> None:
+        """Queue a frame for this client without blocking"""
+        if len(self._outbox) >= MAX_PENDING_FRAMES:
+            # Slow consumer: queued position frames are superseded by the
+            # full snapshot the next tick sends once synced_map is cleared
+            kept = deque(f for f in self._outbox if not f[1])
+            METRICS.dropped_frames += len(self._outbox) - len(kept) + position
+            self._outbox = kept
+            self.synced_map = None
+            if position:
+                return
+            if len(self._outbox) >= MAX_PENDING_FRAMES:
+                # Nothing left that can be dropped, give up on this client
+                self._outbox.clear()
+                if self._closer is None:
+                    METRICS.slow_disconnects += 1
+                    self.close_later()
+                return
+        self._outbox.append((frame, position))
+        self._ready.set()
+
+    def close_later(self) -> None:
+        """Close the connection without waiting, handle_client cleans up when its receive loop ends"""
+        if self._closer is None:
+            self._closer = asyncio.create_task(self.websocket.close())
+
+    async def _write_loop(self) -> None:
+        try:
+            while True:
+                await self._ready.wait()
+                while self._outbox:
+                    frame, _ = self._outbox.popleft()
+                    await self.websocket.send(frame)
+                    METRICS.bytes_out += len(frame)
+                self._ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Connection is gone, handle_client cleans up when its receive loop ends
+            pass
+
+
+# Only touched from the event loop and never across an await, so no lock is needed
+CONNECTED_CLIENTS: Dict[Any, ClientState] = {}
+
+# Inbound work collected between ticks: only the newest position of each
+# client is applied, and chat is fanned out as one frame per tick
+PENDING_POSITIONS: Dict[ClientState, tuple[float, float, str]] = {}
+PENDING_CHAT: list[ChatRecord] = []
+
+
+def flush_client_input() -> None:
+    """Apply the coalesced positions and fan out the chat received since the last tick"""
+    if PENDING_POSITIONS:
+        for state, (x, y, map_name) in PENDING_POSITIONS.items():
+            _update_player(state, x, y, map_name)
+        PENDING_POSITIONS.clear()
+    if PENDING_CHAT:
+        chat_json = chat_update_json(PENDING_CHAT)
+        for client_state in CONNECTED_CLIENTS.values():
+            client_state.send(chat_json)
+        METRICS.sent("chat_update", len(CONNECTED_CLIENTS))
+        PENDING_CHAT.clear()
 
 
 async def broadcast_player_update():
-    """Broadcast player list to all connected clients periodically"""
+    """Broadcast player changes to connected clients periodically.
+
+    Each client only hears about players on its own map. A client that has
+    just connected or switched map gets a full players_update of that map,
+    after that it only receives players_delta frames with the players that
+    moved since the previous tick. The websocket is reliable and ordered, so
+    every frame handed to it acts as the client's acknowledged baseline.
+    """
+    last_view: Dict[int, tuple] = {}
+    moving: set = set()
+    tick = 0
     while True:
-        await asyncio.sleep(0.0167)  # 60 updates per second
+        await asyncio.sleep(1.0 / BROADCAST_RATE)
+        tick_started = time.perf_counter()
+        payload_bytes = 0
+        tick += 1
+        flush_client_input()
         players = PLAYER_HANDLER.list_players()
-        message = {
-            "type": "players_update",
-            "players": players,
-            "timestamp": time.time()
-        }
-        msg_json = json.dumps(message)
-        # Broadcast to all connected clients
-        disconnected = set()
-        async with CLIENTS_LOCK:
-            for client in CONNECTED_CLIENTS:
-                try:
-                    await client.send(msg_json)
-                except Exception:
-                    disconnected.add(client)
-            # Remove disconnected clients
-            CONNECTED_CLIENTS.difference_update(disconnected)
+        changed, departed = diff_players(last_view, moving, players)
+        now = time.time()
+        # Deltas are identical for every client on a map, encode them once per format
+        delta_frames: Dict[tuple[str, bool], str | bytes] = {}
+        by_map: Dict[str, dict] | None = None
+        # Queue frames for every connected client, the writers do the sending
+        for state in CONNECTED_CLIENTS.values():
+            try:
+                me = players.get(state.player_id)
+                client_map = me["map"] if me else ""
+                map_id = state.map_id(client_map) if state.binary else 0
+                if state.synced_map != client_map:
+                    if by_map is None:
+                        by_map = {}
+                        for pid, p in players.items():
+                            by_map.setdefault(p["map"], {})[pid] = p
+                    encode_started = time.perf_counter()
+                    frame = encode_players(
+                        state.binary, PLAYERS_UPDATE, tick, now,
+                        client_map, map_id, by_map.get(client_map, {}), []
+                    )
+                    METRICS.encode_time.add(time.perf_counter() - encode_started)
+                    METRICS.sent(PLAYERS_UPDATE)
+                    state.synced_map = client_map
+                else:
+                    key = (client_map, state.binary)
+                    if key not in delta_frames:
+                        moved = changed.get(client_map)
+                        gone = departed.get(client_map)
+                        encode_started = time.perf_counter()
+                        delta_frames[key] = encode_players(
+                            state.binary, PLAYERS_DELTA, tick, now,
+                            client_map, map_id, moved or {}, gone or []
+                        ) if moved or gone else ""
+                        if delta_frames[key]:
+                            METRICS.encode_time.add(time.perf_counter() - encode_started)
+                    frame = delta_frames[key]
+                    if not frame:
+                        continue
+                    METRICS.sent(PLAYERS_DELTA)
+                payload_bytes += len(frame)
+                state.send(frame, position=True)
+            except Exception as e:
+                # One client's bad state must not stop the broadcast for everyone else
+                print(f"[Server] Broadcast to player {state.player_id} failed: {e}")
+                state.close_later()
+        METRICS.tick(tick_started, time.perf_counter() - tick_started, payload_bytes, 1.0 / BROADCAST_RATE)
+
+
+def _handle_binary(state: ClientState, message: bytes) -> None:
+    """Handle a binary frame from a client that negotiated the binary protocol"""
+    if message[:1] != bytes([protocol.MSG_PLAYER_UPDATE]):
+        raise ValueError("unknown_frame")
+    map_id, x, y = protocol.decode_player_update(message)
+    map_name = state.upload_maps.get(map_id)
+    if map_name is None:
+        raise ValueError("unknown_map_id")
+    PENDING_POSITIONS[state] = (x, y, map_name)
+
+
+def _accept_map(name: str) -> str:
+    """Check a map name from a client and intern it, so every map table downstream stays bounded"""
+    if len(name) > protocol.MAX_MAP_NAME:
+        raise ValueError("map_name_too_long")
+    MAP_IDS.intern(name)
+    return name
+
+
+def _update_player(state: ClientState, x: float, y: float, map_name: str) -> None:
+    if SHARDS is None:
+        PLAYER_HANDLER.update(state.player_id, x, y, map_name)
+    else:
+        state.map_name = map_name
+        SHARDS.update(state.player_id, x, y, map_name)
+
+
+def _relay_shard_frames(kind: str, map_name: str, text: str, binary: bytes) -> None:
+    """Pass a frame built by a shard worker on to the clients on that map"""
+    for state in CONNECTED_CLIENTS.values():
+        if state.map_name != map_name:
+            continue
+        if kind == PLAYERS_UPDATE:
+            if state.synced_map == map_name:
+                continue
+            state.synced_map = map_name
+        elif state.synced_map != map_name:
+            continue
+        if state.binary:
+            state.map_id(map_name)
+        METRICS.sent(kind)
+        state.send(binary if state.binary else text, position=True)
+
+
+async def request_shard_snapshots():
+    """Front-process tick: forward client input and ask for snapshots of maps with an unsynced client"""
+    while True:
+        await asyncio.sleep(1.0 / BROADCAST_RATE)
+        flush_client_input()
+        # Backpressure: don't queue the next tick while a worker is still behind on this one
+        await SHARDS.drain()
+        wanted = {state.map_name for state in CONNECTED_CLIENTS.values() if state.synced_map != state.map_name}
+        for map_name in wanted:
+            SHARDS.request_snapshot(map_name)
 
 
 async def handle_client(websocket: Any):
     """Handle a WebSocket client connection"""
     player_id = -1
-    
-    async with CLIENTS_LOCK:
-        CONNECTED_CLIENTS.add(websocket)
+    state = ClientState(websocket)
     
     try:
+        state.start()
         # Register player on connection - server assigns ID
-        player_id = PLAYER_HANDLER.register()
-        await websocket.send(json.dumps({
+        player_id = SHARDS.register() if SHARDS else PLAYER_HANDLER.register()
+        state.player_id = player_id
+        state.send(json.dumps({
             "type": "registered",
             "id": player_id
         }))
         
-        # Send initial player list
-        players = PLAYER_HANDLER.list_players()
-        await websocket.send(json.dumps({
-            "type": "players_update",
-            "players": players,
-            "timestamp": time.time()
-        }))
+        # The broadcast loop sends the initial player list of the client's map
+        CONNECTED_CLIENTS[websocket] = state
         
-        # Send recent chat messages
-        recent_chat = CHAT.list_since(0)
-        await websocket.send(json.dumps({
-            "type": "chat_update",
-            "messages": recent_chat
-        }))
+        # Send recent chat messages, the ones still pending arrive with the next fan-out
+        history = CHAT.list_since(0)
+        if PENDING_CHAT:
+            history = [r for r in history if r.id < PENDING_CHAT[0].id]
+        state.send(chat_update_json(history))
         
         # Handle incoming messages
         async for message in websocket:
             try:
+                if not state.allow("any"):
+                    continue
+                if isinstance(message, bytes):
+                    METRICS.received("binary", len(message))
+                    if state.allow("player_update"):
+                        _handle_binary(state, message)
+                    continue
+                decode_started = time.perf_counter()
                 data = json.loads(message)
+                METRICS.decode_time.add(time.perf_counter() - decode_started)
                 msg_type = data.get("type")
+                kind = message_kind(msg_type)
+                METRICS.received(kind, len(message))
+                if not state.allow(kind):
+                    if msg_type == "chat_send":
+                        state.send(json.dumps({
+                            "type": "error",
+                            "message": "rate_limited"
+                        }))
+                    continue
+                
+                
+                if msg_type == "hello":
+                    # Protocol negotiation, JSON unless the client offers binary
+                    offered = data.get("protocols", [])
+                    state.binary = protocol.BINARY in offered
+                    state.synced_map = None  # resend the snapshot in the new format
+                    state.send(json.dumps({
+                        "type": "protocol",
+                        "name": protocol.BINARY if state.binary else protocol.JSON
+                    }))
                 
+                elif msg_type == "map_id":
+                    # Client declares a map id it will use in binary uploads
+                    map_id = int(data.get("id"))
+                    if not 0 <= map_id <= 0xFFFF:
+                        raise ValueError("unknown_map_id")
+                    if map_id not in state.upload_maps and len(state.upload_maps) >= protocol.MAX_MAP_IDS:
+                        raise ValueError("too_many_maps")
+                    state.upload_maps[map_id] = _accept_map(str(data.get("name", "")))
                 
-                if msg_type == "player_update":
+                elif msg_type == "player_update":
                     # Update player position - use server-assigned ID, ignore client ID
                     x = float(data.get("x", 0))
                     y = float(data.get("y", 0))
-                    map_name = str(data.get("map", ""))
+                    map_name = _accept_map(str(data.get("map", "")))
                     
                     # Use the server-assigned player_id, not client-provided
                     # HINT: This part might be helpful for direction change
                     # Maybe you can add other parameters? 
-                    PLAYER_HANDLER.update(player_id, x, y, map_name)
+                    # Applied at the next tick, later updates overwrite this one
+                    PENDING_POSITIONS[state] = (x, y, map_name)
                     
                 elif msg_type == "chat_send":
                     # Send chat message - use server-assigned ID
                     text = str(data.get("text", ""))
                     if text:
                         try:
-                            msg = CHAT.add(player_id, text)  # Use server-assigned ID
-                            # Broadcast to all clients
-                            chat_msg = {
-                                "type": "chat_update",
-                                "messages": [msg]
-                            }
-                            chat_json = json.dumps(chat_msg)
-                            async with CLIENTS_LOCK:
-                                disconnected = set()
-                                for client in CONNECTED_CLIENTS:
-                                    try:
-                                        await client.send(chat_json)
-                                    except Exception:
-                                        disconnected.add(client)
-                                CONNECTED_CLIENTS.difference_update(disconnected)
+                            record = CHAT.add(player_id, text)  # Use server-assigned ID
+                            # Broadcast to all clients with the next tick's batch
+                            PENDING_CHAT.append(record)
                         except ValueError:
-                            await websocket.send(json.dumps({
+                            state.send(json.dumps({
                                 "type": "error",
                                 "message": "empty_message"
                             }))
                             
             except json.JSONDecodeError:
-                await websocket.send(json.dumps({
+                METRICS.received("invalid_json", len(message))
+                state.send(json.dumps({
                     "type": "error",
                     "message": "invalid_json"
                 }))
             except Exception as e:
-                await websocket.send(json.dumps({
+                state.send(json.dumps({
                     "type": "error",
                     "message": str(e)
                 }))
@@ -176,20 +488,71 @@ async def handle_client(websocket: Any):
         print(f"[Server] Client handler error: {ex}")
     finally:
         # Unregister player on disconnect
+        PENDING_POSITIONS.pop(state, None)
         if player_id >= 0:
-            PLAYER_HANDLER.remove(player_id)
-        async with CLIENTS_LOCK:
-            CONNECTED_CLIENTS.discard(websocket)
+            if SHARDS:
+                SHARDS.remove(player_id)
+            else:
+                PLAYER_HANDLER.remove(player_id)
+        CONNECTED_CLIENTS.pop(websocket, None)
+        await state.stop()
 
 
-async def main():
+def _metrics_gauges() -> dict:
+    """Current values for the metrics snapshot"""
+    depths = [state.queued for state in CONNECTED_CLIENTS.values()]
+    return {
+        "sharded": SHARDS is not None,
+        "shards_down": len(SHARDS.down) if SHARDS else 0,
+        "clients": len(CONNECTED_CLIENTS),
+        "players": len(SHARDS) if SHARDS else len(PLAYER_HANDLER),
+        "send_queue_max": max(depths, default=0),
+        "send_queue_mean": round(sum(depths) / len(depths), 2) if depths else 0.0,
+        "chat_messages": len(CHAT),
+    }
+
+
+def _process_request(connection: Any, request: Any):
+    """Serve GET /metrics on the websocket port to local clients, everything else is a websocket"""
+    if request.path != "/metrics":
+        return None
+    host = ipaddress.ip_address(connection.remote_address[0])
+    if not (host.is_loopback or (host.version == 6 and host.ipv4_mapped and host.ipv4_mapped.is_loopback)):
+        return connection.respond(HTTPStatus.FORBIDDEN, "Forbidden\n")
+    response = connection.respond(HTTPStatus.OK, json.dumps(METRICS.snapshot(_metrics_gauges()), indent=2) + "\n")
+    response.headers["Content-Type"] = "application/json"
+    return response
+
+
+async def main(sharded: bool = False, metrics_file: str | None = None):
+    global SHARDS
     print(f"[Server] Running WebSocket server on ws://0.0.0.0:{PORT}")
-    # Start broadcast task
-    asyncio.create_task(broadcast_player_update())
+    if sharded:
+        # Workers own the players, this process only relays their frames
+        SHARDS = ShardRouter(MAP_IDS, BROADCAST_RATE)
+        await SHARDS.start(_relay_shard_frames)
+        print(f"[Server] Sharded across {SHARDS.count} worker processes")
+        asyncio.create_task(request_shard_snapshots())
+    else:
+        # Start inactivity eviction and broadcast tasks
+        PLAYER_HANDLER.start()
+        asyncio.create_task(broadcast_player_update())
+    asyncio.create_task(METRICS.run(_metrics_gauges, metrics_file))
     # Start server
-    async with serve(handle_client, "0.0.0.0", PORT):
-        await asyncio.Future()  # run forever
+    try:
+        async with serve(handle_client, "0.0.0.0", PORT, process_request=_process_request):
+            await asyncio.Future()  # run forever
+    finally:
+        if SHARDS:
+            await SHARDS.stop()
+        else:
+            await PLAYER_HANDLER.stop()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Monster Go online server")
+    parser.add_argument("--sharded", action="store_true",
+                        help="run one worker process per map group (see server/shard.py)")
+    parser.add_argument("--metrics-file", help="also write the /metrics snapshot to this file every second")
+    args = parser.parse_args()
+    asyncio.run(main(args.sharded, args.metrics_file))
\ No newline at end of file
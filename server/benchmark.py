@@ -0,0 +1,312 @@
+"""
+Headless load generator for server.py.
+
+Spawns simulated clients that speak the same protocol as OnlineManager:
+position uploads at a fixed rate while random-walking across the maps,
+plus occasional chat bursts. Prints one JSON document with the results so
+runs can be compared across server changes:
+
+    python -m server.benchmark --clients 200 --duration 30 --spawn-server
+    python -m server.benchmark --clients 200 --spawn-server --sharded --output run.json
+
+Every upload carries a position the client has not sent recently (a small
+fractional offset on x), so when the client sees its own position come back
+in a broadcast it knows exactly which upload that was. The time between sending it and
+seeing it is the end-to-end latency. Tick jitter is measured from the
+server timestamps on consecutive ticks. Server CPU is read from /proc, so
+it is only reported on Linux and for a server the benchmark can see
+(--spawn-server or --server-pid).
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+
+from websockets.asyncio.client import connect
+
+from server import protocol
+
+MAPS = ("map.tmx", "gym.tmx", "new_map.tmx")
+# One walking step, matches GameSettings.TILE_SIZE on the client
+STEP = 64
+
+
+@dataclass
+class ClientStats:
+    """Raw samples collected by one worker process, merged by the parent"""
+    connected: int = 0
+    failed: int = 0
+    latencies: list[float] = field(default_factory=list)
+    tick_intervals: list[float] = field(default_factory=list)
+    bytes_in: int = 0
+    bytes_out: int = 0
+    frames_in: int = 0
+    uploads: int = 0
+    chats: int = 0
+
+    def merge(self, other: "ClientStats") -> None:
+        self.connected += other.connected
+        self.failed += other.failed
+        self.latencies += other.latencies
+        self.tick_intervals += other.tick_intervals
+        self.bytes_in += other.bytes_in
+        self.bytes_out += other.bytes_out
+        self.frames_in += other.frames_in
+        self.uploads += other.uploads
+        self.chats += other.chats
+
+
+class SimulatedClient:
+    """One fake player: uploads positions, sends chat and watches broadcasts"""
+    def __init__(self, args: argparse.Namespace, stats: ClientStats, seed: int) -> None:
+        self.args = args
+        self.stats = stats
+        self.rng = random.Random(seed)
+        self.player_id = -1
+        self.map_name = self.rng.choice(MAPS)
+        self.x = self.rng.randrange(0, 40) * STEP
+        self.y = self.rng.randrange(0, 40) * STEP
+        # Positions still in flight, (x, y) -> monotonic send time
+        self.pending: dict[tuple[float, float], float] = {}
+        self.last_tick: tuple[int, float] | None = None
+
+    async def run(self, deadline: float) -> None:
+        try:
+            async with connect(self.args.url, max_size=None) as ws:
+                self.stats.connected += 1
+                receiver = asyncio.create_task(self._receive(ws))
+                try:
+                    await self._send(ws, deadline)
+                finally:
+                    receiver.cancel()
+        except Exception:
+            self.stats.failed += 1
+
+    async def _emit(self, ws, message: str | bytes) -> None:
+        self.stats.bytes_out += len(message)
+        await ws.send(message)
+
+    async def _send(self, ws, deadline: float) -> None:
+        args = self.args
+        if args.binary:
+            await self._emit(ws, json.dumps({"type": "hello", "protocols": [protocol.BINARY, protocol.JSON]}))
+            for map_id, name in enumerate(MAPS):
+                await self._emit(ws, json.dumps({"type": "map_id", "id": map_id, "name": name}))
+        interval = 1.0 / args.rate
+        next_send = time.monotonic() + self.rng.random() * interval
+        next_chat = time.monotonic() + self.rng.expovariate(1.0 / args.chat_interval) if args.chat_interval > 0 else None
+        seq = 0
+        while next_send < deadline:
+            await asyncio.sleep(max(0.0, next_send - time.monotonic()))
+            next_send += interval
+            self._walk()
+            # The fractional part makes every upload unique, binary frames carry float32
+            seq = (seq + 1) % 64
+            x = self.x + seq / 64
+            self.pending[(x, float(self.y))] = time.monotonic()
+            if args.binary:
+                message = protocol.encode_player_update(MAPS.index(self.map_name), x, self.y)
+            else:
+                message = json.dumps({"type": "player_update", "x": x, "y": self.y, "map": self.map_name})
+            await self._emit(ws, message)
+            self.stats.uploads += 1
+            if next_chat is not None and time.monotonic() >= next_chat:
+                for i in range(args.chat_burst):
+                    await self._emit(ws, json.dumps({"type": "chat_send", "text": f"bench {self.player_id} #{i}"}))
+                    self.stats.chats += 1
+                next_chat += self.rng.expovariate(1.0 / args.chat_interval)
+
+    def _walk(self) -> None:
+        if self.rng.random() < self.args.map_change:
+            self.map_name = self.rng.choice(MAPS)
+            self.pending.clear()
+            self.last_tick = None
+        dx, dy = self.rng.choice(((STEP, 0), (-STEP, 0), (0, STEP), (0, -STEP)))
+        self.x = max(0, self.x + dx)
+        self.y = max(0, self.y + dy)
+
+    async def _receive(self, ws) -> None:
+        async for message in ws:
+            now = time.monotonic()
+            self.stats.bytes_in += len(message)
+            self.stats.frames_in += 1
+            if isinstance(message, bytes):
+                _, tick, ts, _, records, _ = protocol.decode_players(message)
+                self._on_players(now, tick, ts, records.get(self.player_id))
+                continue
+            data = json.loads(message)
+            msg_type = data.get("type")
+            if msg_type == "registered":
+                self.player_id = int(data["id"])
+            elif msg_type in ("players_update", "players_delta"):
+                me = data.get("players", {}).get(str(self.player_id))
+                self._on_players(now, data.get("tick", 0), data.get("timestamp", 0.0),
+                                 (me["x"], me["y"]) if me else None)
+
+    def _on_players(self, now: float, tick: int, ts: float, me: tuple[float, float] | None) -> None:
+        if self.last_tick is not None and tick == self.last_tick[0] + 1:
+            self.stats.tick_intervals.append(ts - self.last_tick[1])
+        self.last_tick = (tick, ts)
+        if me is None:
+            return
+        sent = self.pending.pop((float(me[0]), float(me[1])), None)
+        if sent is not None:
+            self.stats.latencies.append(now - sent)
+            # Anything older was coalesced away by the server
+            self.pending = {k: t for k, t in self.pending.items() if t > sent}
+
+
+def _run_worker(args: argparse.Namespace, first: int, count: int, start_at: float) -> ClientStats:
+    """Run a slice of the clients in this process"""
+    async def run() -> ClientStats:
+        stats = ClientStats()
+        deadline = start_at + args.ramp + args.duration
+        tasks = []
+        for i in range(first, first + count):
+            client = SimulatedClient(args, stats, args.seed + i)
+            # Spread connections over the ramp-up period
+            delay = start_at + args.ramp * i / max(1, args.clients) - time.monotonic()
+            tasks.append(asyncio.create_task(_delayed(client.run(deadline), delay)))
+        await asyncio.gather(*tasks)
+        return stats
+    return asyncio.run(run())
+
+
+async def _delayed(coro, delay: float):
+    await asyncio.sleep(max(0.0, delay))
+    return await coro
+
+
+def _cpu_seconds(pid: int) -> float | None:
+    """User + system CPU of a process and its direct children (shard workers), Linux only"""
+    try:
+        ppid, utime, stime = _stat(pid)
+    except (OSError, ValueError):
+        return None
+    ticks = utime + stime
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            ppid, utime, stime = _stat(int(entry))
+        except (OSError, ValueError):
+            continue    # exited while we were looking
+        if ppid == pid:
+            ticks += utime + stime
+    return ticks / os.sysconf("SC_CLK_TCK")
+
+
+def _stat(pid: int) -> tuple[int, int, int]:
+    """(parent pid, user ticks, system ticks) from /proc/<pid>/stat"""
+    with open(f"/proc/{pid}/stat") as f:
+        # Fields after the command name start at field 3 (state)
+        fields = f.read().rsplit(")", 1)[1].split()
+    return int(fields[1]), int(fields[11]), int(fields[12])
+
+
+def _percentiles(samples: list[float], scale: float = 1000.0) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * scale, 3)
+    return {
+        "count": len(ordered),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "max": round(ordered[-1] * scale, 3),
+    }
+
+
+def _summary(args: argparse.Namespace, stats: ClientStats, cpu: float | None, elapsed: float) -> dict:
+    intervals = stats.tick_intervals
+    period = statistics.median(intervals) if intervals else 0.0
+    client_seconds = max(1, stats.connected) * args.duration
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "clients": {"connected": stats.connected, "failed": stats.failed},
+        "latency_ms": _percentiles(stats.latencies),
+        "tick_interval_ms": _percentiles(intervals),
+        "tick_jitter_ms": _percentiles([abs(i - period) for i in intervals]),
+        "bytes_in_per_client_s": round(stats.bytes_in / client_seconds, 1),
+        "bytes_out_per_client_s": round(stats.bytes_out / client_seconds, 1),
+        "frames_in_per_client_s": round(stats.frames_in / client_seconds, 2),
+        "uploads": stats.uploads,
+        "chats": stats.chats,
+        "server_cpu_percent": round(100.0 * cpu / elapsed, 1) if cpu is not None else None,
+        "elapsed_s": round(elapsed, 2),
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load-test the Monster Go server")
+    parser.add_argument("--url", default="ws://localhost:8989")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to keep every client running after ramp-up")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which clients connect")
+    parser.add_argument("--rate", type=float, default=10.0, help="position uploads per client per second")
+    parser.add_argument("--map-change", type=float, default=0.01, help="chance per step to jump to another map")
+    parser.add_argument("--chat-interval", type=float, default=10.0, help="mean seconds between chat bursts, 0 disables chat")
+    parser.add_argument("--chat-burst", type=int, default=3, help="messages per chat burst")
+    parser.add_argument("--binary", action="store_true", help="negotiate the binary position protocol")
+    parser.add_argument("--processes", type=int, default=1, help="client processes, so the generator is not the bottleneck")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--spawn-server", action="store_true", help="start server.py for the run and measure its CPU")
+    parser.add_argument("--sharded", action="store_true", help="with --spawn-server, pass --sharded to server.py")
+    parser.add_argument("--server-pid", type=int, help="pid of an already running server to measure CPU for")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> dict:
+    args = parse_args(argv)
+    server = None
+    server_pid = args.server_pid
+    if args.spawn_server:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        command = [sys.executable, "server.py"] + (["--sharded"] if args.sharded else [])
+        server = subprocess.Popen(command, cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        server_pid = server.pid
+        time.sleep(3.0 if args.sharded else 1.0)
+
+    try:
+        cpu_before = _cpu_seconds(server_pid) if server_pid else None
+        started = time.monotonic()
+        start_at = started + 0.5
+        stats = ClientStats()
+        per_process = -(-args.clients // args.processes)
+        slices = [(first, min(per_process, args.clients - first)) for first in range(0, args.clients, per_process)]
+        if len(slices) == 1:
+            stats.merge(_run_worker(args, 0, args.clients, start_at))
+        else:
+            with multiprocessing.get_context("spawn").Pool(len(slices)) as pool:
+                for part in pool.starmap(_run_worker, [(args, first, count, start_at) for first, count in slices]):
+                    stats.merge(part)
+        elapsed = time.monotonic() - started
+        cpu_after = _cpu_seconds(server_pid) if server_pid else None
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=5.0)
+
+    cpu = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+    result = _summary(args, stats, cpu, elapsed)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Tick diffing and frame encoding shared by the single-process server and the shard workers.
+"""
+import json
+from typing import Dict
+
+from server import protocol
+
+PLAYERS_UPDATE = "players_update"
+PLAYERS_DELTA = "players_delta"
+
+
+def diff_players(last_view: Dict[int, tuple], moving: set, players: dict) -> tuple[Dict[str, dict], Dict[str, list]]:
+    """Compare this tick's players with the previous tick, grouped by map.
+
+    Returns the players that moved or arrived on each map and the ids that
+    left each map (switched map or disconnected). A player that stopped this
+    tick is sent once more so clients see it standing still instead of
+    extrapolating its last velocity. last_view and moving are updated in place.
+    """
+    changed: Dict[str, dict] = {}
+    departed: Dict[str, list] = {}
+    for pid, p in players.items():
+        cur = (p["x"], p["y"], p["map"])
+        prev = last_view.get(pid)
+        if prev == cur:
+            if pid in moving:
+                moving.discard(pid)
+                changed.setdefault(cur[2], {})[pid] = p
+            continue
+        moving.add(pid)
+        if prev is not None and prev[2] != cur[2]:
+            departed.setdefault(prev[2], []).append(pid)
+        changed.setdefault(cur[2], {})[pid] = p
+        last_view[pid] = cur
+    for pid in [pid for pid in last_view if pid not in players]:
+        moving.discard(pid)
+        departed.setdefault(last_view.pop(pid)[2], []).append(pid)
+    return changed, departed
+
+
+def encode_players(binary: bool, kind: str, tick: int, now: float, map_name: str,
+                   map_id: int, players: dict, removed: list) -> str | bytes:
+    """Build a players_update / players_delta frame in either wire format"""
+    if binary:
+        code = protocol.MSG_PLAYERS_UPDATE if kind == PLAYERS_UPDATE else protocol.MSG_PLAYERS_DELTA
+        return protocol.encode_players(code, tick, now, map_id, players, removed)
+    message = {
+        "type": kind,
+        "players": players,
+        "tick": tick,
+        "timestamp": now
+    }
+    if kind == PLAYERS_DELTA:
+        message["removed"] = removed
+    return json.dumps(message)
@@ -0,0 +1,130 @@
+"""
+Runtime instrumentation for server.py.
+
+The server records samples into METRICS as it runs; a snapshot is served as
+JSON on http://127.0.0.1:<PORT>/metrics (loopback only, on the websocket
+port) and can also be written to a file every second with --metrics-file.
+"""
+import asyncio
+import json
+import time
+from collections import Counter, deque
+from typing import Callable
+
+# Samples kept for the rolling summaries, about a minute of ticks at 20 Hz
+WINDOW_SIZE = 1200
+
+
+class Window:
+    """Rolling summary of the most recent samples"""
+    def __init__(self, size: int = WINDOW_SIZE) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def add(self, value: float) -> None:
+        self._samples.append(value)
+
+    def summary(self, scale: float = 1.0) -> dict:
+        if not self._samples:
+            return {"count": 0}
+        ordered = sorted(self._samples)
+        n = len(ordered)
+        return {
+            "count": n,
+            "mean": round(sum(ordered) / n * scale, 3),
+            "p50": round(ordered[n // 2] * scale, 3),
+            "p99": round(ordered[min(n - 1, int(n * 0.99))] * scale, 3),
+            "max": round(ordered[-1] * scale, 3),
+        }
+
+
+class ServerMetrics:
+    """Counters and timing windows filled in by the server's event loop"""
+    def __init__(self) -> None:
+        self.started = time.time()
+        self.ticks = 0
+        self.late_ticks = 0
+        self.tick_duration = Window()
+        self.tick_interval = Window()
+        self.tick_bytes = Window()
+        self.encode_time = Window()
+        self.decode_time = Window()
+        self.messages_in: Counter[str] = Counter()
+        self.messages_out: Counter[str] = Counter()
+        self.rate_limited: Counter[str] = Counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.dropped_frames = 0
+        self.slow_disconnects = 0
+        # Per-second rates, refreshed by run()
+        self.rates_in: dict[str, float] = {}
+        self.rates_out: dict[str, float] = {}
+        self._last_counts: tuple[float, Counter, Counter] = (time.monotonic(), Counter(), Counter())
+        self._last_tick: float | None = None
+
+    # Recording
+    def tick(self, started: float, duration: float, payload_bytes: int, period: float) -> None:
+        """Record one broadcast tick; a tick that starts more than half a period late counts as late"""
+        self.ticks += 1
+        self.tick_duration.add(duration)
+        self.tick_bytes.add(payload_bytes)
+        if self._last_tick is not None:
+            interval = started - self._last_tick
+            self.tick_interval.add(interval)
+            if interval > period * 1.5:
+                self.late_ticks += 1
+        self._last_tick = started
+
+    def received(self, msg_type: str, size: int) -> None:
+        self.messages_in[msg_type] += 1
+        self.bytes_in += size
+
+    def sent(self, msg_type: str, count: int = 1) -> None:
+        """Count frames queued for clients, bytes are counted when the writers send them"""
+        self.messages_out[msg_type] += count
+
+    # Reporting
+    def _refresh_rates(self) -> None:
+        now = time.monotonic()
+        then, counts_in, counts_out = self._last_counts
+        elapsed = max(now - then, 1e-6)
+        self.rates_in = {k: round((v - counts_in[k]) / elapsed, 2) for k, v in self.messages_in.items()}
+        self.rates_out = {k: round((v - counts_out[k]) / elapsed, 2) for k, v in self.messages_out.items()}
+        self._last_counts = (now, self.messages_in.copy(), self.messages_out.copy())
+
+    def snapshot(self, gauges: dict) -> dict:
+        """Everything as one JSON-ready dict; gauges are current values the server passes in"""
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "ticks": self.ticks,
+            "late_ticks": self.late_ticks,
+            "tick_duration_ms": self.tick_duration.summary(1000.0),
+            "tick_interval_ms": self.tick_interval.summary(1000.0),
+            "tick_payload_bytes": self.tick_bytes.summary(),
+            "frame_encode_ms": self.encode_time.summary(1000.0),
+            "json_decode_ms": self.decode_time.summary(1000.0),
+            "messages_in": dict(self.messages_in),
+            "messages_out": dict(self.messages_out),
+            "messages_in_per_s": self.rates_in,
+            "messages_out_per_s": self.rates_out,
+            "rate_limited": dict(self.rate_limited),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "dropped_frames": self.dropped_frames,
+            "slow_disconnects": self.slow_disconnects,
+            **gauges,
+        }
+
+    async def run(self, gauges: Callable[[], dict], path: str | None = None, interval: float = 1.0) -> None:
+        """Refresh the per-second rates and, with a path, rewrite the metrics file"""
+        while True:
+            await asyncio.sleep(interval)
+            self._refresh_rates()
+            if path:
+                try:
+                    with open(path, "w") as f:
+                        json.dump(self.snapshot(gauges()), f, indent=2)
+                except OSError as e:
+                    print(f"[Server] Failed to write metrics: {e}")
+
+
+METRICS = ServerMetrics()
@@ -1,105 +1,200 @@
-import threading
+import asyncio
+import heapq
 import time
-import copy
-from dataclasses import dataclass
-from typing import Dict, Optional
+from array import array
+from types import MappingProxyType
+from typing import Dict, Mapping
+
+from server.protocol import MapTable
 
 TIMEOUT_TIME = 60.0
-CHECK_INTERVAL_TIME = 10.0
-
-@dataclass
-class Player:
-    id: int
-    x: float
-    y: float
-    map: str
-    last_update: float
-
-    def update(self, x: float, y: float, map: str) -> None:
-        if x != self.x or y != self.y or map != self.map:
-            self.last_update = time.monotonic()
-        self.x = x
-        self.y = y
-        self.map = map
-
-    def is_inactive(self) -> bool:
-        now = time.monotonic()
-        return (now - self.last_update) >= TIMEOUT_TIME
+
+# Marks an unused slot in the pid column
+FREE_SLOT = -1
 
 
 class PlayerHandler:
-    _lock: threading.Lock
-    _stop_event: threading.Event
-    _thread: threading.Thread | None
-    
-    players: Dict[int, Player]
+    """
+    Player store for the server, laid out as parallel columns.
+
+    Each player owns a slot in the x/y/map/last-update/pid arrays; freed
+    slots go on a free list and are reused, while player ids keep counting
+    up so clients never see an id change hands. Map names are interned to
+    small ids.
+
+    Everything runs on the server's event loop, so nothing locks. Readers
+    get an immutable published snapshot: entries are replaced rather than
+    mutated, and a new snapshot is published at most once per batch of
+    changes.
+
+    Inactivity eviction keeps one (deadline, id) heap entry per player. When
+    an entry comes due and the player has moved since, it is pushed back with
+    the real deadline instead of evicting, so each wakeup only touches the
+    players that are actually due.
+    """
+    _evictor: asyncio.Task | None
+    _expiry: list[tuple[float, int]]
+    _queued: set[int]   # ids with an entry in _expiry
+
+    # Columns, indexed by slot
+    _pids: array
+    _xs: array
+    _ys: array
+    _maps: array
+    _last_update: array
+    _free_slots: list[int]
+    _slot_of: Dict[int, int]
+    _map_table: MapTable
     _next_id: int
+    # Copy-on-write publication
+    _entries: Dict[int, dict]
+    _snapshot: Mapping[int, dict]
+    _dirty: set[int]
+    _stale: bool
 
     def __init__(self, *, timeout_seconds: float = 120.0, check_interval_seconds: float = 5.0):
-        self._lock = threading.Lock()
-        self._stop_event = threading.Event()
-        self._thread = None
-        
-        self.players = {}
+        self._evictor = None
+        self._expiry = []
+        self._queued = set()
+
+        self._pids = array('q')
+        self._xs = array('d')
+        self._ys = array('d')
+        self._maps = array('I')
+        self._last_update = array('d')
+        self._free_slots = []
+        self._slot_of = {}
+        self._map_table = MapTable()
         self._next_id = 0
-        
-    # Threading
+        self._entries = {}
+        self._snapshot = MappingProxyType({})
+        self._dirty = set()
+        self._stale = False
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    # Eviction task, must be started from inside the running loop
     def start(self) -> None:
-        if self._thread and self._thread.is_alive():
+        if self._evictor and not self._evictor.done():
             return
-        self._stop_event.clear()
-        self._thread = threading.Thread(target=self._cleaner, name="PlayerCleaner", daemon=True)
-        self._thread.start()
-
-    def stop(self) -> None:
-        self._stop_event.set()
-        if self._thread:
-            self._thread.join(timeout=2.0)
-
-    def _cleaner(self) -> None:
-        while not self._stop_event.wait(CHECK_INTERVAL_TIME):
-            now = time.monotonic()
-            to_remove: list[int] = []
-            with self._lock:
-                for pid, p in list(self.players.items()):
-                    if now - p.last_update >= TIMEOUT_TIME:
-                        to_remove.append(pid)
-                for pid in to_remove:
-                    _ = self.players.pop(pid, None)
-                    
+        self._evictor = asyncio.create_task(self._evict_loop())
+
+    async def stop(self) -> None:
+        if self._evictor:
+            self._evictor.cancel()
+            try:
+                await self._evictor
+            except asyncio.CancelledError:
+                pass
+            self._evictor = None
+
+    async def _evict_loop(self) -> None:
+        while True:
+            # New players always expire after everything already queued
+            delay = self._expiry[0][0] - time.monotonic() if self._expiry else TIMEOUT_TIME
+            await asyncio.sleep(max(delay, 0.0))
+            self.evict_expired(time.monotonic())
+
+    def evict_expired(self, now: float) -> int:
+        """Remove every player idle for TIMEOUT_TIME, returns how many were evicted"""
+        evicted = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            _, pid = heapq.heappop(self._expiry)
+            slot = self._slot_of.get(pid)
+            if slot is None:
+                self._queued.discard(pid)
+                continue
+            deadline = self._last_update[slot] + TIMEOUT_TIME
+            if deadline > now:
+                # Updated since the entry was pushed, requeue at the real deadline
+                heapq.heappush(self._expiry, (deadline, pid))
+                continue
+            self._queued.discard(pid)
+            self.remove(pid)
+            evicted += 1
+        return evicted
+
     # API
-    def register(self) -> int:
-        with self._lock:
+    def register(self, pid: int | None = None) -> int:
+        """Add a player and return its id; shard workers pass the id the front process assigned"""
+        if pid is None:
             pid = self._next_id
-            self._next_id += 1
-            self.players[pid] = Player(pid, 0.0, 0.0, "", time.monotonic())
+        elif pid in self._slot_of:
             return pid
+        self._next_id = max(self._next_id, pid + 1)
+        now = time.monotonic()
+        empty_map = self._map_table.intern("")
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._pids[slot] = pid
+            self._xs[slot] = 0.0
+            self._ys[slot] = 0.0
+            self._maps[slot] = empty_map
+            self._last_update[slot] = now
+        else:
+            slot = len(self._pids)
+            self._pids.append(pid)
+            self._xs.append(0.0)
+            self._ys.append(0.0)
+            self._maps.append(empty_map)
+            self._last_update.append(now)
+        self._slot_of[pid] = slot
+        self._dirty.add(pid)
+        # A re-registered id may still have its old entry queued, which gets requeued when due
+        if pid not in self._queued:
+            self._queued.add(pid)
+            heapq.heappush(self._expiry, (now + TIMEOUT_TIME, pid))
+        return pid
 
     def remove(self, pid: int) -> bool:
         """Remove a player from the handler when they disconnect."""
-        with self._lock:
-            if pid in self.players:
-                del self.players[pid]
-                return True
+        slot = self._slot_of.pop(pid, None)
+        if slot is None:
             return False
+        self._pids[slot] = FREE_SLOT
+        self._free_slots.append(slot)
+        self._entries.pop(pid, None)
+        self._dirty.discard(pid)
+        self._stale = True
+        return True
 
     def update(self, pid: int, x: float, y: float, map_name: str) -> bool:
-        with self._lock:
-            p = self.players.get(pid)
-            if not p:
-                return False
-            else:
-                p.update(float(x), float(y), str(map_name))
-                return True
-
-    def list_players(self) -> dict:
-        with self._lock:
-            player_list = {}
-            for p in self.players.values():
-                player_list[p.id] = {
-                    "id": p.id,
-                    "x": p.x,
-                    "y": p.y,
-                    "map": p.map
-                }
-            return player_list
+        slot = self._slot_of.get(pid)
+        if slot is None:
+            return False
+        try:
+            map_id = self._map_table.intern(str(map_name))
+        except ValueError:
+            # The map table is capped (protocol.MAX_MAP_IDS), uploads naming maps past it are dropped
+            return False
+        # Any upload counts as liveness, clients resend an unchanged position as a heartbeat
+        self._last_update[slot] = time.monotonic()
+        x = float(x)
+        y = float(y)
+        if x != self._xs[slot] or y != self._ys[slot] or map_id != self._maps[slot]:
+            self._xs[slot] = x
+            self._ys[slot] = y
+            self._maps[slot] = map_id
+            self._dirty.add(pid)
+        return True
+
+    def list_players(self) -> Mapping[int, dict]:
+        """Read-only snapshot of every player, only rebuilt when something changed"""
+        if self._dirty or self._stale:
+            self._publish()
+        return self._snapshot
+
+    def _publish(self) -> None:
+        names = self._map_table.names
+        for pid in self._dirty:
+            slot = self._slot_of[pid]
+            self._entries[pid] = {
+                "id": pid,
+                "x": self._xs[slot],
+                "y": self._ys[slot],
+                "map": names[self._maps[slot]]
+            }
+        self._dirty.clear()
+        self._stale = False
+        self._snapshot = MappingProxyType(dict(self._entries))
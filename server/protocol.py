@@ -0,0 +1,85 @@
+"""
+Compact binary encoding for position traffic between OnlineManager and the server.
+
+Clients opt in by sending {"type": "hello", "protocols": ["binary", "json"]};
+the server answers with {"type": "protocol", "name": ...}. Without that
+handshake everything stays JSON. Only the high-rate position frames are
+binary, chat and control messages are always JSON.
+
+Map names are interned to small integer ids. Each side owns the ids it
+sends: the client declares {"type": "map_id", "id": n, "name": ...} before
+using an id in an upload, and the server sends {"type": "map_ids", "maps":
+{name: id}} before using an id in a broadcast.
+"""
+import struct
+
+BINARY = "binary"
+JSON = "json"
+
+# First byte of every binary frame
+MSG_PLAYER_UPDATE = 1
+MSG_PLAYERS_UPDATE = 2
+MSG_PLAYERS_DELTA = 3
+
+# type, map id, x, y
+_UPLOAD = struct.Struct("<BHff")
+# type, tick, timestamp, map id, player count, removed count
+_HEADER = struct.Struct("<BIdHHH")
+# player id, x, y
+_RECORD = struct.Struct("<Iff")
+_REMOVED = struct.Struct("<I")
+
+# Map names come from clients, so tables are capped well below the 65536 ids a u16 holds
+MAX_MAP_IDS = 1024
+MAX_MAP_NAME = 64
+
+
+class MapTable:
+    """Interns map names to small integer ids, at most limit of them"""
+    def __init__(self, limit: int = MAX_MAP_IDS) -> None:
+        self.limit = limit
+        self.ids: dict[str, int] = {}
+        self.names: list[str] = []
+
+    def intern(self, name: str) -> int:
+        """Id of name, added if new; raises ValueError once the table is full"""
+        map_id = self.ids.get(name)
+        if map_id is None:
+            if len(self.names) >= self.limit:
+                raise ValueError("too_many_maps")
+            map_id = len(self.names)
+            self.ids[name] = map_id
+            self.names.append(name)
+        return map_id
+
+
+def encode_player_update(map_id: int, x: float, y: float) -> bytes:
+    return _UPLOAD.pack(MSG_PLAYER_UPDATE, map_id, x, y)
+
+
+def decode_player_update(data: bytes) -> tuple[int, float, float]:
+    _, map_id, x, y = _UPLOAD.unpack(data)
+    return map_id, x, y
+
+
+def encode_players(kind: int, tick: int, timestamp: float, map_id: int,
+                   players: dict[int, dict], removed: list[int]) -> bytes:
+    """Pack a players_update / players_delta frame; every player in it is on map_id"""
+    parts = [_HEADER.pack(kind, tick & 0xFFFFFFFF, timestamp, map_id, len(players), len(removed))]
+    for pid, p in players.items():
+        parts.append(_RECORD.pack(pid, p["x"], p["y"]))
+    for pid in removed:
+        parts.append(_REMOVED.pack(pid))
+    return b"".join(parts)
+
+
+def decode_players(data: bytes) -> tuple[int, int, float, int, dict[int, tuple[float, float]], list[int]]:
+    """Unpack a players frame into (kind, tick, timestamp, map id, {id: (x, y)}, removed ids)"""
+    kind, tick, timestamp, map_id, n_players, n_removed = _HEADER.unpack_from(data, 0)
+    offset = _HEADER.size
+    players: dict[int, tuple[float, float]] = {}
+    for pid, x, y in _RECORD.iter_unpack(data[offset:offset + n_players * _RECORD.size]):
+        players[pid] = (x, y)
+    offset += n_players * _RECORD.size
+    removed = [pid for (pid,) in _REMOVED.iter_unpack(data[offset:offset + n_removed * _REMOVED.size])]
+    return kind, tick, timestamp, map_id, players, removed
@@ -0,0 +1,271 @@
+"""
+Sharded server mode: worker processes own the players of specific maps.
+
+The front process (python server.py --sharded) keeps every websocket and the
+chat. It forwards each position upload to the worker that owns the player's
+map. Each worker runs its own PlayerHandler and tick diff, encodes the
+players_update / players_delta frames for its maps in both wire formats, and
+sends them back, so the front only relays them to the clients on that map.
+When an upload reports a map owned by another worker, the player is removed
+from the old worker and registered on the new one.
+
+The front and the workers talk over socketpairs with length-prefixed
+messages, so no broker or extra port is involved.
+"""
+import asyncio
+import multiprocessing
+import socket
+import struct
+import time
+from typing import Callable, Dict
+
+from server.broadcast import PLAYERS_DELTA, PLAYERS_UPDATE, diff_players, encode_players
+from server.playerHandler import PlayerHandler
+from server.protocol import MapTable
+
+# Default layout, maps missing from every shard go to the first one
+SHARD_MAPS: list[tuple[str, ...]] = [("map.tmx",), ("gym.tmx",), ("new_map.tmx",)]
+
+_LENGTH = struct.Struct("<I")
+
+# front -> worker
+OP_MAP = 1        # map id, name: declares an id before it is used
+OP_UPDATE = 2     # player id, map id, x, y
+OP_LEAVE = 3      # player id
+OP_SNAPSHOT = 4   # map id: send a full players_update of that map next tick
+# worker -> front
+OP_FRAMES = 5     # kind, map id, JSON frame, binary frame
+
+_OP = struct.Struct("<B")
+_MAP = struct.Struct("<BH")
+_UPDATE = struct.Struct("<BIHdd")
+_LEAVE = struct.Struct("<BI")
+_SNAPSHOT = struct.Struct("<BH")
+_FRAMES = struct.Struct("<BBHII")
+
+_KINDS = (PLAYERS_UPDATE, PLAYERS_DELTA)
+
+# Called with (kind, map name, JSON frame, binary frame) for every frame a worker sends
+FrameHandler = Callable[[str, str, str, bytes], None]
+
+
+def _write(writer: asyncio.StreamWriter, payload: bytes) -> None:
+    writer.write(_LENGTH.pack(len(payload)) + payload)
+
+
+async def _read(reader: asyncio.StreamReader) -> bytes:
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    return await reader.readexactly(length)
+
+
+# ------------------------------
+# Worker process
+# ------------------------------
+class ShardWorker:
+    """Owns the players of a few maps and produces their broadcast frames"""
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, rate: int) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.rate = rate
+        self.players = PlayerHandler()
+        self.map_names: Dict[int, str] = {}
+        self.map_ids: Dict[str, int] = {}
+        self.snapshot_requests: set[int] = set()
+
+    async def run(self) -> None:
+        self.players.start()
+        tick_task = asyncio.create_task(self._tick_loop())
+        try:
+            while True:
+                self._handle(await _read(self.reader))
+        except asyncio.IncompleteReadError:
+            # Front process is gone
+            pass
+        finally:
+            tick_task.cancel()
+            await self.players.stop()
+
+    def _handle(self, payload: bytes) -> None:
+        (op,) = _OP.unpack_from(payload)
+        if op == OP_UPDATE:
+            _, pid, map_id, x, y = _UPDATE.unpack(payload)
+            self.players.register(pid)
+            self.players.update(pid, x, y, self.map_names[map_id])
+        elif op == OP_LEAVE:
+            _, pid = _LEAVE.unpack(payload)
+            self.players.remove(pid)
+        elif op == OP_SNAPSHOT:
+            _, map_id = _SNAPSHOT.unpack(payload)
+            self.snapshot_requests.add(map_id)
+        elif op == OP_MAP:
+            _, map_id = _MAP.unpack_from(payload)
+            name = payload[_MAP.size:].decode()
+            self.map_names[map_id] = name
+            self.map_ids[name] = map_id
+
+    def _send_frames(self, kind: str, tick: int, now: float, map_name: str, players: dict, removed: list) -> None:
+        map_id = self.map_ids[map_name]
+        text = encode_players(False, kind, tick, now, map_name, map_id, players, removed).encode()
+        binary = encode_players(True, kind, tick, now, map_name, map_id, players, removed)
+        _write(self.writer, _FRAMES.pack(OP_FRAMES, _KINDS.index(kind), map_id, len(text), len(binary)) + text + binary)
+
+    async def _tick_loop(self) -> None:
+        last_view: Dict[int, tuple] = {}
+        moving: set = set()
+        tick = 0
+        while True:
+            await asyncio.sleep(1.0 / self.rate)
+            tick += 1
+            players = self.players.list_players()
+            changed, departed = diff_players(last_view, moving, players)
+            now = time.time()
+            # Full snapshots go first, a delta of the same tick is then harmless to apply again
+            if self.snapshot_requests:
+                by_map: Dict[str, dict] = {}
+                for pid, p in players.items():
+                    by_map.setdefault(p["map"], {})[pid] = p
+                for map_id in self.snapshot_requests:
+                    name = self.map_names[map_id]
+                    self._send_frames(PLAYERS_UPDATE, tick, now, name, by_map.get(name, {}), [])
+                self.snapshot_requests.clear()
+            for name in changed.keys() | departed.keys():
+                self._send_frames(PLAYERS_DELTA, tick, now, name, changed.get(name, {}), departed.get(name, []))
+            await self.writer.drain()
+
+
+def _worker_main(sock: socket.socket, rate: int) -> None:
+    async def run() -> None:
+        reader, writer = await asyncio.open_connection(sock=sock)
+        await ShardWorker(reader, writer, rate).run()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+# ------------------------------
+# Front process
+# ------------------------------
+class ShardRouter:
+    """
+    Front-process side of sharding: starts one worker per map group and keeps
+    track of which worker each player currently lives on.
+
+    register/update/remove mirror PlayerHandler so handle_client can use
+    either one.
+    """
+    def __init__(self, map_ids: MapTable, rate: int, shard_maps: list[tuple[str, ...]] = SHARD_MAPS) -> None:
+        self.map_ids = map_ids
+        self.rate = rate
+        self._owner: Dict[str, int] = {name: i for i, names in enumerate(shard_maps) for name in names}
+        self.count = len(shard_maps)
+        self._processes: list[multiprocessing.Process] = []
+        self._writers: list[asyncio.StreamWriter] = []
+        self._readers: list[asyncio.Task] = []
+        # Map ids each worker has been told about
+        self._declared: list[set[int]] = []
+        # Worker index each player is registered on
+        self._placement: Dict[int, int] = {}
+        # Workers that exited or dropped their connection, their maps get no more frames
+        self.down: set[int] = set()
+        self._next_id = 0
+
+    async def start(self, on_frames: FrameHandler) -> None:
+        # spawn keeps the workers clear of the front's running event loop
+        ctx = multiprocessing.get_context("spawn")
+        for i in range(self.count):
+            front_sock, worker_sock = socket.socketpair()
+            process = ctx.Process(target=_worker_main, args=(worker_sock, self.rate),
+                                  name=f"Shard-{i}", daemon=True)
+            process.start()
+            worker_sock.close()
+            reader, writer = await asyncio.open_connection(sock=front_sock)
+            self._processes.append(process)
+            self._writers.append(writer)
+            self._declared.append(set())
+            self._readers.append(asyncio.create_task(self._read_loop(i, reader, on_frames)))
+
+    async def stop(self) -> None:
+        for task in self._readers:
+            task.cancel()
+        for writer in self._writers:
+            writer.close()
+        for process in self._processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+
+    async def drain(self) -> None:
+        """Wait for every worker to take what was written to it, so a stalled one can't grow the front's buffers"""
+        for index, writer in enumerate(self._writers):
+            if index in self.down:
+                continue
+            try:
+                await writer.drain()
+            except ConnectionError as e:
+                self._mark_down(index, str(e))
+
+    def _mark_down(self, index: int, reason: str) -> None:
+        if index in self.down:
+            return
+        self.down.add(index)
+        maps = [name for name, owner in self._owner.items() if owner == index]
+        print(f"[Server] Shard {index} stopped ({reason}), players on {maps} get no more position frames")
+
+    async def _read_loop(self, index: int, reader: asyncio.StreamReader, on_frames: FrameHandler) -> None:
+        while True:
+            try:
+                payload = await _read(reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            try:
+                _, kind, map_id, text_len, binary_len = _FRAMES.unpack_from(payload)
+                text = payload[_FRAMES.size:_FRAMES.size + text_len].decode()
+                binary = payload[_FRAMES.size + text_len:_FRAMES.size + text_len + binary_len]
+                on_frames(_KINDS[kind], self.map_ids.names[map_id], text, binary)
+            except Exception as e:
+                # A bad frame or a failed relay only costs that frame
+                print(f"[Server] Dropped a frame from shard {index}: {e}")
+        self._mark_down(index, f"worker exited, exit code {self._processes[index].exitcode}")
+
+    def __len__(self) -> int:
+        return len(self._placement)
+
+    def shard_of(self, map_name: str) -> int:
+        return self._owner.get(map_name, 0)
+
+    def _map_id(self, index: int, map_name: str) -> int:
+        # map_ids is capped at protocol.MAX_MAP_IDS, so ids always fit the u16 fields above
+        map_id = self.map_ids.intern(map_name)
+        if map_id not in self._declared[index]:
+            _write(self._writers[index], _MAP.pack(OP_MAP, map_id) + map_name.encode())
+            self._declared[index].add(map_id)
+        return map_id
+
+    def register(self) -> int:
+        pid = self._next_id
+        self._next_id += 1
+        self.update(pid, 0.0, 0.0, "")
+        return pid
+
+    def update(self, pid: int, x: float, y: float, map_name: str) -> bool:
+        index = self.shard_of(map_name)
+        previous = self._placement.get(pid)
+        if previous is not None and previous != index:
+            # Hand the player off: the old worker reports it as departed
+            _write(self._writers[previous], _LEAVE.pack(OP_LEAVE, pid))
+        self._placement[pid] = index
+        map_id = self._map_id(index, map_name)
+        _write(self._writers[index], _UPDATE.pack(OP_UPDATE, pid, map_id, x, y))
+        return True
+
+    def remove(self, pid: int) -> bool:
+        index = self._placement.pop(pid, None)
+        if index is None:
+            return False
+        _write(self._writers[index], _LEAVE.pack(OP_LEAVE, pid))
+        return True
+
+    def request_snapshot(self, map_name: str) -> None:
+        index = self.shard_of(map_name)
+        _write(self._writers[index], _SNAPSHOT.pack(OP_SNAPSHOT, self._map_id(index, map_name)))
@@ -0,0 +1,259 @@
+"""
+Headless, deterministic benchmark of the game client.
+
+Runs Engine on SDL's dummy video and audio drivers and drives it with
+scripted scenarios instead of a player, one fixed timestep per frame, with
+online play off and the random generator seeded. The same scenario file
+therefore replays the same frames on every run, and the JSON it prints can be
+compared across client changes:
+
+    python -m src.core.benchmark benchmarks/scenarios.json
+    python -m src.core.benchmark benchmarks/scenarios.json --scenario battle --allocations --output run.json
+
+A scenario file holds one scenario or a list of them:
+
+    {"name": "walk", "seed": 1, "steps": [
+        {"scene": "game"},
+        {"hold": ["right"], "frames": 60},
+        {"click": "bagpack_button"},
+        {"press": "escape"},
+        {"wait": 30},
+        {"loaded_maps": ["map.tmx"]}
+    ]}
+
+Steps:
+    scene   switch to a registered scene
+    wait    run this many frames with no input
+    hold    keep keys (pygame key names) down for "frames" frames
+    press   tap a key
+    click   left-click an attribute of the current scene (a Button or a
+            pg.Rect, e.g. "navigation_gym" or "fight_button_rect"), or [x, y]
+    loaded_maps  check that exactly these maps of the game scene's save are
+            loaded, and stop the run otherwise (runs no frame)
+
+"scene" runs one frame, "press" and "click" two (press, then release) and
+"hold" its frames plus one for the release. Update and draw times are
+reported per scene. "sections_ms"
+breaks the frame down with the profiler, over its last 600 frames. gc_gen0 is
+how many young-generation collections ran, a cheap measure of allocation rate.
+--allocations turns on tracemalloc, which slows every frame, to report memory
+growth per scene and the top allocation sites.
+"""
+import argparse
+import gc
+import inspect
+import json
+import logging
+import os
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+
+# Headless: has to be set before pygame initialises video and audio on import of the services
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+import pygame as pg
+
+from src.utils import GameSettings, Logger
+
+# Keep stdout for the results, and logging out of the timed frames
+Logger.setLevel(logging.WARNING)
+
+from .engine import Engine
+from .services import profiler, scene_manager
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    n = len(ordered)
+    return {
+        "count": n,
+        "mean": round(sum(ordered) / n, 3),
+        "p50": round(ordered[n // 2], 3),
+        "p95": round(ordered[min(n - 1, int(n * 0.95))], 3),
+        "p99": round(ordered[min(n - 1, int(n * 0.99))], 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+@dataclass
+class SceneStats:
+    update_ms: list[float] = field(default_factory=list)
+    draw_ms: list[float] = field(default_factory=list)
+    gc_gen0: int = 0
+    alloc_bytes: int = 0
+
+    def summary(self, allocations: bool) -> dict:
+        result = {
+            "frames": len(self.update_ms),
+            "update_ms": _percentiles(self.update_ms),
+            "draw_ms": _percentiles(self.draw_ms),
+            "gc_gen0": self.gc_gen0,
+        }
+        if allocations:
+            result["net_alloc_kib"] = round(self.alloc_bytes / 1024, 1)
+        return result
+
+
+class ScenarioRunner:
+    """Plays one scenario on a fresh Engine and collects per-scene timings"""
+    def __init__(self, scenario: dict, dt: float, allocations: bool) -> None:
+        self.scenario = scenario
+        self.dt = dt
+        self.allocations = allocations
+        self.stats: dict[str, SceneStats] = {}
+        self.frames = 0
+        random.seed(scenario.get("seed", 0))
+        self.engine = Engine()
+        profiler.enabled = True
+        profiler.reset()
+
+    # Input
+    def _post(self, event_type: int, **attrs) -> None:
+        pg.event.post(pg.event.Event(event_type, **attrs))
+
+    def _key(self, name: str) -> int:
+        return pg.key.key_code(name)
+
+    def _click_pos(self, target) -> tuple[int, int]:
+        if isinstance(target, list):
+            return (int(target[0]), int(target[1]))
+        obj = getattr(scene_manager.current_scene, target)
+        rect = obj if isinstance(obj, pg.Rect) else obj.hitbox
+        return rect.center
+
+    # Frames
+    def _frame(self) -> None:
+        gen0 = gc.get_stats()[0]["collections"]
+        before = tracemalloc.get_traced_memory()[0] if self.allocations else 0
+        self.engine.step(self.dt)
+        totals = profiler.last_frame()
+        # Scenes switch at the start of update, so this is the scene that ran the frame
+        name = scene_manager.current_scene_name or "none"
+        stats = self.stats.setdefault(name, SceneStats())
+        stats.update_ms.append(totals.get("update", 0.0))
+        stats.draw_ms.append(totals.get("render", 0.0))
+        stats.gc_gen0 += gc.get_stats()[0]["collections"] - gen0
+        if self.allocations:
+            stats.alloc_bytes += tracemalloc.get_traced_memory()[0] - before
+        self.frames += 1
+
+    def _run_step(self, step: dict) -> None:
+        if "scene" in step:
+            scene_manager.change_scene(step["scene"])
+            self._frame()
+        elif "wait" in step:
+            for _ in range(int(step["wait"])):
+                self._frame()
+        elif "hold" in step:
+            keys = [self._key(k) for k in step["hold"]]
+            for key in keys:
+                self._post(pg.KEYDOWN, key=key, mod=0, unicode="", scancode=0)
+            for _ in range(int(step.get("frames", 1))):
+                self._frame()
+            for key in keys:
+                self._post(pg.KEYUP, key=key, mod=0, unicode="", scancode=0)
+            self._frame()
+        elif "press" in step:
+            key = self._key(step["press"])
+            self._post(pg.KEYDOWN, key=key, mod=0, unicode="", scancode=0)
+            self._frame()
+            self._post(pg.KEYUP, key=key, mod=0, unicode="", scancode=0)
+            self._frame()
+        elif "click" in step:
+            pos = self._click_pos(step["click"])
+            self._post(pg.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(0, 0, 0))
+            self._post(pg.MOUSEBUTTONDOWN, pos=pos, button=1)
+            self._frame()
+            self._post(pg.MOUSEBUTTONUP, pos=pos, button=1)
+            self._frame()
+        elif "loaded_maps" in step:
+            maps = scene_manager.current_scene.game_manager.maps
+            loaded = sorted(key for key in maps if maps.is_loaded(key))
+            if loaded != sorted(step["loaded_maps"]):
+                raise RuntimeError(f"Expected maps {sorted(step['loaded_maps'])} to be loaded, found {loaded}")
+        else:
+            raise ValueError(f"Unknown scenario step: {step}")
+
+    def run(self) -> dict:
+        if self.allocations:
+            tracemalloc.start()
+            baseline = tracemalloc.take_snapshot()
+        started = time.perf_counter()
+        for step in self.scenario["steps"]:
+            self._run_step(step)
+        wall = time.perf_counter() - started
+
+        result = {
+            "scenario": self.scenario.get("name", "unnamed"),
+            "frames": self.frames,
+            "wall_s": round(wall, 3),
+            "fps": round(self.frames / wall, 1) if wall > 0 else None,
+            "scenes": {name: stats.summary(self.allocations) for name, stats in self.stats.items()},
+            "sections_ms": profiler.summary(),
+        }
+        if self.allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            # The profiler's trace buffer grows by design, leave it out of the allocation sites
+            ignore = [
+                tracemalloc.Filter(False, inspect.getfile(type(profiler))),
+                tracemalloc.Filter(False, tracemalloc.__file__),
+            ]
+            snapshot = tracemalloc.take_snapshot().filter_traces(ignore)
+            top = snapshot.compare_to(baseline.filter_traces(ignore), "lineno")[:10]
+            tracemalloc.stop()
+            result["allocations"] = {
+                "current_kib": round(current / 1024, 1),
+                "peak_kib": round(peak / 1024, 1),
+                "top": [
+                    {"where": str(stat.traceback), "size_kib": round(stat.size_diff / 1024, 1), "count": stat.count_diff}
+                    for stat in top
+                ],
+            }
+        return result
+
+
+def load_scenarios(path: str, only: list[str] | None = None) -> list[dict]:
+    with open(path) as f:
+        data = json.load(f)
+    scenarios = data if isinstance(data, list) else [data]
+    if only:
+        scenarios = [s for s in scenarios if s.get("name") in only]
+    return scenarios
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay scripted scenarios on a headless client and time every frame")
+    parser.add_argument("scenarios", help="JSON file with one scenario or a list of them")
+    parser.add_argument("--scenario", action="append", help="only run the scenario with this name, may repeat")
+    parser.add_argument("--fps", type=int, default=None, help="fixed timestep as frames per second, defaults to GameSettings.FPS")
+    parser.add_argument("--dirty-rects", action="store_true", help="run with GameSettings.DIRTY_RECTS on")
+    parser.add_argument("--allocations", action="store_true", help="trace allocations with tracemalloc (slower frames)")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> list[dict]:
+    args = parse_args(argv)
+    GameSettings.IS_ONLINE = False
+    GameSettings.DIRTY_RECTS = args.dirty_rects
+    dt = 1.0 / (args.fps or GameSettings.FPS)
+
+    results = []
+    for scenario in load_scenarios(args.scenarios, args.scenario):
+        results.append(ScenarioRunner(scenario, dt, args.allocations).run())
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 import pygame as pg
 
 from src.utils import GameSettings, Logger
-from .services import scene_manager, input_manager
+from .services import scene_manager, input_manager, profiler
 
 from src.scenes.menu_scene import MenuScene
 from src.scenes.game_scene import GameScene
@@ -41,9 +41,21 @@ class Engine:
 
         while self.running:
             dt = self.clock.tick(GameSettings.FPS) / 1000.0
+            self.step(dt)
+
+        if profiler.enabled:
+            profiler.dump_trace()
+
+    def step(self, dt: float):
+        """One frame: input, update and render"""
+        profiler.begin_frame()
+        with profiler.section("events"):
             self.handle_events()
+        with profiler.section("update"):
             self.update(dt)
+        with profiler.section("render"):
             self.render()
+        profiler.end_frame()
 
     def handle_events(self):
         input_manager.reset()
@@ -51,11 +63,33 @@ class Engine:
             if event.type == pg.QUIT:
                 self.running = False
             input_manager.handle_events(event)
+        if profiler.enabled:
+            if input_manager.key_pressed(pg.K_F3):
+                profiler.show_overlay = not profiler.show_overlay
+            if input_manager.key_pressed(pg.K_F4):
+                profiler.dump_trace()
 
     def update(self, dt: float):
         scene_manager.update(dt)
 
     def render(self):
-        self.screen.fill((0, 0, 0))     # Make sure the display is cleared
-        scene_manager.draw(self.screen) # Draw the current scene
-        pg.display.flip()               # Render the display
+        # The profiler overlay changes every frame, so it needs full redraws
+        partial = GameSettings.DIRTY_RECTS and not profiler.show_overlay
+        rects = scene_manager.dirty_rects() if partial else None
+        if rects is None:
+            self.screen.fill((0, 0, 0))     # Make sure the display is cleared
+            scene_manager.draw(self.screen) # Draw the current scene
+            profiler.draw(self.screen)      # Frame-time overlay, when shown
+            with profiler.section("present"):
+                pg.display.flip()           # Render the display
+            return
+        if not rects:
+            # Nothing changed, the last frame stays on screen
+            return
+        # Redraw only inside the changed area and present just those rects
+        self.screen.set_clip(rects[0].unionall(rects[1:]))
+        self.screen.fill((0, 0, 0))
+        scene_manager.draw(self.screen)
+        self.screen.set_clip(None)
+        with profiler.section("present"):
+            pg.display.update(rects)
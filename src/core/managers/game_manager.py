@@ -6,6 +6,8 @@ from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from src.maps.map import Map
+    from src.maps.map_store import MapStore
+    from src.maps.map_prefetcher import MapPrefetcher
     from src.entities.player import Player
     from src.entities.enemy_trainer import EnemyTrainer
     from src.entities.shop_manager import ShopManager
@@ -21,14 +23,15 @@ class GameManager:
     
     # Map properties
     current_map_key: str
-    maps: dict[str, Map]
+    maps: MapStore
+    prefetcher: MapPrefetcher
     
     # Changing Scene properties
     should_change_scene: bool
     next_map: str
     next_position: Position | None
     
-    def __init__(self, maps: dict[str, Map], start_map: str, 
+    def __init__(self, maps: MapStore, start_map: str, 
                  player: Player | None,
                  enemy_trainers: dict[str, list[EnemyTrainer]],
                  shop_managers: dict[str, list[ShopManager]] | None = None,
@@ -36,8 +39,10 @@ class GameManager:
                  shop_list: Bag | None = None):
                      
         from src.data.bag import Bag
+        from src.maps.map_prefetcher import MapPrefetcher
         # Game Properties
         self.maps = maps
+        self.prefetcher = MapPrefetcher(maps)
         self.current_map_key = start_map
         self.player = player
         self.enemy_trainers = enemy_trainers
@@ -81,6 +86,8 @@ class GameManager:
             target_position = self.next_position
             
             self.current_map_key = target_map
+            self.prefetcher.finish(target_map)
+            self.maps.visit(target_map)
             self.next_map = ""
             self.next_position = None
             self.should_change_scene = False
@@ -92,6 +99,11 @@ class GameManager:
                 else:
                     self.player.position = self.maps[self.current_map_key].spawn.copy()
             
+    def prefetch_maps(self) -> None:
+        """Start loading the maps behind teleporters the player is close to"""
+        if self.player:
+            self.prefetcher.update(self.current_map, self.player.position)
+
     def check_collision(self, rect: pg.Rect) -> bool:
         if self.maps[self.current_map_key].check_collision(rect):
             return True
@@ -124,8 +136,9 @@ class GameManager:
 
     def to_dict(self) -> dict[str, object]:
         map_blocks: list[dict[str, object]] = []
-        for key, m in self.maps.items():
-            block = m.to_dict()
+        for key in self.maps:
+            # Maps that were never visited are saved from their original entry
+            block = self.maps.describe(key)
             block["enemy_trainers"] = [t.to_dict() for t in self.enemy_trainers.get(key, [])]
             block["shop_managers"] = [s.to_dict() for s in self.shop_managers.get(key, [])]
             map_blocks.append(block)
@@ -139,7 +152,7 @@ class GameManager:
 
     @classmethod
     def from_dict(cls, data: dict[str, object]) -> "GameManager":
-        from src.maps.map import Map
+        from src.maps.map_store import MapStore
         from src.entities.player import Player
         from src.entities.enemy_trainer import EnemyTrainer
         from src.entities.shop_manager import ShopManager
@@ -147,14 +160,14 @@ class GameManager:
         
         Logger.info("Loading maps")
         maps_data = data["map"]
-        maps: dict[str, Map] = {}
+        # Maps are only built when first used
+        maps = MapStore(maps_data)
         player_spawns: dict[str, Position] = {}
         trainers: dict[str, list[EnemyTrainer]] = {}
         shops: dict[str, list[ShopManager]] = {}
 
         for entry in maps_data:
             path = entry["path"]
-            maps[path] = Map.from_dict(entry)
             sp = entry.get("player")
             if sp:
                 player_spawns[path] = Position(
@@ -170,6 +183,7 @@ class GameManager:
             bag=None
         )
         gm.current_map_key = current_map
+        maps.visit(current_map)
         
         Logger.info("Loading enemy trainers")
         for m in data["map"]:
@@ -1,12 +1,13 @@
 import asyncio
 import threading
 import time
-import queue
 import collections
 import json
+import math
 from collections import deque
 from typing import Optional
 from src.utils import Logger, GameSettings
+from server import protocol
 
 try:
     import websockets
@@ -17,8 +18,25 @@ except ImportError:
 from typing import Any
 
 
+# Remote players are drawn this far in the past so there are two snapshots to blend
+INTERPOLATION_DELAY = 0.1
+# How long a remote player keeps moving on its last velocity when snapshots are late
+EXTRAPOLATION_LIMIT = 0.25
+# Snapshots kept per remote player
+SNAPSHOT_BUFFER_SIZE = 8
+# Upload pacing: aim for one update per SEND_DISTANCE pixels moved, within these bounds
+SEND_DISTANCE = GameSettings.TILE_SIZE / 4
+MIN_SEND_INTERVAL = 1 / 30
+MAX_SEND_INTERVAL = 0.2
+# Resend the unchanged position this often so the server knows we're still here
+HEARTBEAT_INTERVAL = 2.0
+
+
 class OnlineManager:
     list_players: list[dict]
+    _players: dict[int, dict]
+    # Timestamped (t, x, y) snapshots per remote player, newest last
+    _snapshots: dict[int, collections.deque]
     player_id: int
     # WebSocket state
     _ws: Optional[Any]
@@ -26,10 +44,19 @@ class OnlineManager:
     _ws_thread: Optional[threading.Thread]
     _stop_event: threading.Event
     _lock: threading.Lock
-    _update_queue: queue.Queue
-    _chat_out_queue: queue.Queue
+    # Sender state, only touched on the websocket loop
+    _wakeup: asyncio.Event | None
+    _pending_update: dict | None
+    _upload_speed: float
+    _chat_outbox: collections.deque
     _chat_messages: collections.deque
     _last_chat_id: int
+    # Wire format state, reset on every connection
+    _binary: bool
+    _upload_map_ids: protocol.MapTable
+    _server_maps: dict[int, str]
+    # Last position handed to the sender by the game thread
+    _last_queued: tuple[float, float, str] | None
 
     def __init__(self):
         if websockets is None:
@@ -47,15 +74,23 @@ class OnlineManager:
 
         self.player_id = -1
         self.list_players = []
+        self._players = {}
+        self._snapshots = {}
         self._ws = None
         self._ws_loop = None
         self._ws_thread = None
         self._stop_event = threading.Event()
         self._lock = threading.Lock()
-        self._update_queue = queue.Queue(maxsize=10)
-        self._chat_out_queue = queue.Queue(maxsize=50)
+        self._wakeup = None
+        self._pending_update = None
+        self._upload_speed = 0.0
+        self._chat_outbox = deque()
         self._chat_messages = deque(maxlen=200)
         self._last_chat_id = 0
+        self._binary = False
+        self._upload_map_ids = protocol.MapTable()
+        self._server_maps = {}
+        self._last_queued = None
 
         Logger.info("OnlineManager initialized")
 
@@ -71,20 +106,50 @@ class OnlineManager:
             return list(self.list_players)
 
     def update(self, x: float, y: float, map_name: str) -> bool:
-        """Queue position update (no dir / moving)."""
+        """Queue position update (no dir / moving), unchanged positions are not queued."""
         if self.player_id == -1:
             return False
-        try:
-            # HINT: This part might be helpful for direction change
-            # Maybe you can add other parameters?
-            self._update_queue.put_nowait({
-                "x": x,
-                "y": y,
-                "map": map_name,
-            })
+        if (x, y, map_name) == self._last_queued:
             return True
-        except queue.Full:
+        # HINT: This part might be helpful for direction change
+        # Maybe you can add other parameters?
+        if not self._post(self._on_position_update, {
+            "x": x,
+            "y": y,
+            "map": map_name,
+            "t": time.monotonic(),
+        }):
             return False
+        self._last_queued = (x, y, map_name)
+        return True
+
+    def _post(self, callback, *args) -> bool:
+        """Hand work from the game thread to the websocket loop"""
+        loop = self._ws_loop
+        if loop is None or not loop.is_running():
+            return False
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # Loop closed between the check and the call
+            return False
+        return True
+
+    def _on_position_update(self, update: dict) -> None:
+        """Runs on the websocket loop: keep only the newest position and wake the sender"""
+        pending = self._pending_update
+        if pending is not None and update["t"] > pending["t"]:
+            step = math.hypot(update["x"] - pending["x"], update["y"] - pending["y"])
+            self._upload_speed = 0.7 * self._upload_speed + 0.3 * step / (update["t"] - pending["t"])
+        self._pending_update = update
+        if self._wakeup:
+            self._wakeup.set()
+
+    def _on_chat(self, text: str) -> None:
+        """Runs on the websocket loop"""
+        self._chat_outbox.append(text)
+        if self._wakeup:
+            self._wakeup.set()
 
     def start(self) -> None:
         if self._ws_thread and self._ws_thread.is_alive():
@@ -111,6 +176,7 @@ class OnlineManager:
         """Run WebSocket event loop in a separate thread"""
         self._ws_loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self._ws_loop)
+        self._wakeup = asyncio.Event()
         try:
             self._ws_loop.run_until_complete(self._ws_main())
         except Exception as e:
@@ -145,6 +211,21 @@ class OnlineManager:
                     Logger.info("WebSocket connected")
                     reconnect_delay = 1.0  # Reset delay on successful connection
 
+                    # Offer the binary position protocol, stay on JSON until the server accepts
+                    self._binary = False
+                    self._upload_map_ids = protocol.MapTable()
+                    self._server_maps = {}
+                    # Drop the old connection's upload before asking the game thread for its
+                    # position again, anything posted from here on belongs to this connection
+                    self._pending_update = None
+                    self._upload_speed = 0.0
+                    self._last_queued = None
+                    if GameSettings.ONLINE_BINARY_PROTOCOL:
+                        await websocket.send(json.dumps({
+                            "type": "hello",
+                            "protocols": [protocol.BINARY, protocol.JSON]
+                        }))
+
                     # Start sender task
                     sender_task = asyncio.create_task(self._ws_sender(websocket))
 
@@ -172,33 +253,43 @@ class OnlineManager:
                 if not self._stop_event.is_set():
                     await asyncio.sleep(0.5)
 
-    async def _handle_message(self, message: str) -> None:
+    async def _handle_message(self, message: str | bytes) -> None:
         """Handle incoming WebSocket message"""
         try:
+            if isinstance(message, bytes):
+                self._handle_binary(message)
+                return
             data = json.loads(message)
             msg_type = data.get("type")
 
-            if msg_type == "registered":
+            if msg_type == "protocol":
+                self._binary = data.get("name") == protocol.BINARY
+                Logger.info(f"Online protocol: {data.get('name')}")
+
+            elif msg_type == "map_ids":
+                for name, map_id in data.get("maps", {}).items():
+                    self._server_maps[int(map_id)] = str(name)
+
+            elif msg_type == "registered":
                 self.player_id = int(data.get("id", -1))
                 Logger.info(f"OnlineManager registered with id={self.player_id}")
 
             elif msg_type == "players_update":
+                # Full snapshot of the players on our map
+                players_data = data.get("players", {})
+                with self._lock:
+                    self._players = {}
+                    self._merge_players(players_data)
+                    self._publish_players()
+
+            elif msg_type == "players_delta":
+                # Only the players that moved, arrived or left since the last frame
                 players_data = data.get("players", {})
                 with self._lock:
-                    filtered = []
-                    for pid_str, player_data in players_data.items():
-                        pid = int(pid_str)
-                        if pid != self.player_id:
-
-                            # HINT: This part might be helpful for direction change
-                            # Maybe you can add other parameters?
-                            filtered.append({
-                                "id": pid,
-                                "x": float(player_data.get("x", 0)),
-                                "y": float(player_data.get("y", 0)),
-                                "map": str(player_data.get("map", "")),
-                            })
-                    self.list_players = filtered
+                    for pid in data.get("removed", []):
+                        self._players.pop(int(pid), None)
+                    self._merge_players(players_data)
+                    self._publish_players()
 
             elif msg_type == "chat_update":
                 messages = data.get("messages", [])
@@ -217,54 +308,155 @@ class OnlineManager:
         except Exception as e:
             Logger.warning(f"Error handling WebSocket message: {e}")
 
+    def _handle_binary(self, message: bytes) -> None:
+        """Handle a binary players_update / players_delta frame"""
+        kind, _, _, map_id, records, removed = protocol.decode_players(message)
+        map_name = self._server_maps.get(map_id, "")
+        players_data = {pid: {"x": x, "y": y, "map": map_name} for pid, (x, y) in records.items()}
+        with self._lock:
+            if kind == protocol.MSG_PLAYERS_UPDATE:
+                self._players = {}
+            for pid in removed:
+                self._players.pop(pid, None)
+            self._merge_players(players_data)
+            self._publish_players()
+
+    def _merge_players(self, players_data: dict) -> None:
+        """Merge server player entries into self._players, caller holds self._lock"""
+        now = time.monotonic()
+        for pid_str, player_data in players_data.items():
+            pid = int(pid_str)
+            if pid == self.player_id:
+                continue
+            # HINT: This part might be helpful for direction change
+            # Maybe you can add other parameters?
+            entry = {
+                "id": pid,
+                "x": float(player_data.get("x", 0)),
+                "y": float(player_data.get("y", 0)),
+                "map": str(player_data.get("map", "")),
+            }
+            old = self._players.get(pid)
+            track = self._snapshots.get(pid)
+            if track is None or old is None or old["map"] != entry["map"]:
+                # New player or map switch: start a fresh track instead of sliding across maps
+                track = deque(maxlen=SNAPSHOT_BUFFER_SIZE)
+                self._snapshots[pid] = track
+            track.append((now, entry["x"], entry["y"]))
+            self._players[pid] = entry
+
+    def _publish_players(self) -> None:
+        """Expose the merged players and forget tracks of players that left, caller holds self._lock"""
+        self.list_players = list(self._players.values())
+        for pid in [pid for pid in self._snapshots if pid not in self._players]:
+            del self._snapshots[pid]
+
+    def get_interpolated_players(self) -> list[dict]:
+        """Remote players with positions interpolated between snapshots for smooth drawing"""
+        render_t = time.monotonic() - INTERPOLATION_DELAY
+        out: list[dict] = []
+        with self._lock:
+            for pid, player in self._players.items():
+                entry = dict(player)
+                track = self._snapshots.get(pid)
+                if track:
+                    entry["x"], entry["y"] = self._sample_track(track, render_t)
+                out.append(entry)
+        return out
+
+    @staticmethod
+    def _sample_track(track: collections.deque, render_t: float) -> tuple[float, float]:
+        t0, x0, y0 = track[0]
+        if render_t <= t0:
+            return x0, y0
+        for t1, x1, y1 in list(track)[1:]:
+            if render_t < t1:
+                a = (render_t - t0) / (t1 - t0)
+                return x0 + (x1 - x0) * a, y0 + (y1 - y0) * a
+            t0, x0, y0 = t1, x1, y1
+        # Past the newest snapshot: dead-reckon for a short while, then hold
+        if len(track) < 2:
+            return x0, y0
+        tp, xp, yp = track[-2]
+        if t0 <= tp:
+            return x0, y0
+        ahead = min(render_t - t0, EXTRAPOLATION_LIMIT)
+        return x0 + (x0 - xp) / (t0 - tp) * ahead, y0 + (y0 - yp) / (t0 - tp) * ahead
+
     async def _ws_sender(self, websocket: Any) -> None:
-        """Send updates to server via WebSocket"""
-        update_interval = 0.0167  # 60 updates per second
-        last_update = time.monotonic()
+        """Send updates to server via WebSocket, sleeping until there is work or a send is due"""
+        last_sent: dict | None = None
+        last_sent_time = 0.0
 
         while not self._stop_event.is_set():
             try:
-                # Send position updates
-                now = time.monotonic()
-                if now - last_update >= update_interval:
-                    # Collapse queue to latest entry to avoid sending stale movement
-                    latest_update = None
-                    try:
-                        while True:
-                            latest_update = self._update_queue.get_nowait()
-                    except queue.Empty:
-                        pass
-
-                    if latest_update and self.player_id >= 0:
-                        # HINT: This part might be helpful for direction change
-                        # Maybe you can add other parameters? 
-                        message = {
-                            "type": "player_update",
-                            "x": latest_update.get("x"),
-                            "y": latest_update.get("y"),
-                            "map": latest_update.get("map"),
-                        }
-                        await websocket.send(json.dumps(message))
-                        last_update = now
+                # Clear first so work posted while we await a send still wakes the next wait
+                self._wakeup.clear()
+                # Send position updates only when something changed, plus a slow heartbeat
+                timeout = None
+                pending = self._pending_update
+                if pending and self.player_id >= 0:
+                    now = time.monotonic()
+                    if last_sent is None or pending["map"] != last_sent["map"]:
+                        interval = 0.0
+                    elif (pending["x"], pending["y"]) != (last_sent["x"], last_sent["y"]):
+                        interval = self._send_interval(websocket, self._upload_speed)
+                    else:
+                        interval = HEARTBEAT_INTERVAL
+                    timeout = last_sent_time + interval - now
+                    if timeout <= 0:
+                        await self._send_position(websocket, pending)
+                        last_sent = pending
+                        last_sent_time = now
+                        timeout = HEARTBEAT_INTERVAL
 
                 # Send chat messages
+                while self._chat_outbox and self.player_id >= 0:
+                    message = {
+                        "type": "chat_send",
+                        "text": self._chat_outbox.popleft()
+                    }
+                    await websocket.send(json.dumps(message))
+
+                # Sleep until the game thread posts work or the next send is due
                 try:
-                    chat_text = self._chat_out_queue.get_nowait()
-                    if self.player_id >= 0:
-                        message = {
-                            "type": "chat_send",
-                            "text": chat_text
-                        }
-                        await websocket.send(json.dumps(message))
-                except queue.Empty:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
                     pass
 
-                await asyncio.sleep(0.01)  # Small sleep to prevent busy waiting
-
             except Exception as e:
                 Logger.warning(f"WebSocket send error: {e}")
                 await asyncio.sleep(0.1)
 
+    @staticmethod
+    def _send_interval(websocket: Any, speed: float) -> float:
+        """Faster movement sends more often, a slow link (high RTT) sends less often"""
+        interval = SEND_DISTANCE / speed if speed > 0 else MAX_SEND_INTERVAL
+        rtt = getattr(websocket, "latency", 0.0) or 0.0
+        interval = max(interval, rtt / 2)
+        return min(max(interval, MIN_SEND_INTERVAL), MAX_SEND_INTERVAL)
+
+    async def _send_position(self, websocket: Any, update: dict) -> None:
+        """Send a position update in the negotiated wire format"""
+        if self._binary:
+            map_name = update.get("map")
+            known = len(self._upload_map_ids.ids)
+            map_id = self._upload_map_ids.intern(map_name)
+            if map_id >= known:
+                # Declare new map ids before using them
+                await websocket.send(json.dumps({"type": "map_id", "id": map_id, "name": map_name}))
+            await websocket.send(protocol.encode_player_update(map_id, update.get("x"), update.get("y")))
+            return
+        # HINT: This part might be helpful for direction change
+        # Maybe you can add other parameters? 
+        message = {
+            "type": "player_update",
+            "x": update.get("x"),
+            "y": update.get("y"),
+            "map": update.get("map"),
+        }
+        await websocket.send(json.dumps(message))
+
     # -----------------------------
     # Chat API
     # -----------------------------
@@ -274,11 +466,9 @@ class OnlineManager:
         t = (text or "").strip()
         if not t:
             return False
-        try:
-            self._chat_out_queue.put_nowait(t)
-            return True
-        except queue.Full:
+        if len(self._chat_outbox) >= 50:
             return False
+        return self._post(self._on_chat, t)
 
     def get_recent_chat(self, limit: int = 50) -> list[dict]:
         with self._lock:
@@ -0,0 +1,169 @@
+from __future__ import annotations
+import json
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator
+
+import pygame as pg
+
+from src.utils import GameSettings, Logger
+
+# Frames kept for the rolling percentiles and the graph, ten seconds at 60 FPS
+WINDOW_FRAMES = 600
+# Completed sections kept for the trace file, oldest are dropped first
+TRACE_EVENTS = 200_000
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class Profiler:
+    """
+    Times named sections of each frame
+
+    Wrap work in `with profiler.section("map"):`, or bracket it with begin()/end()
+    where a with block would re-indent a long function. Sections may nest and may
+    run several times a frame; their time is summed per frame. Does nothing unless
+    GameSettings.PROFILER is set.
+    """
+    enabled: bool
+    show_overlay: bool
+    _stack: list[tuple[str, int]]
+    _frame_start: int | None
+    _frame_totals: dict[str, float]
+    _samples: dict[str, deque[float]]
+    _frames: deque[float]
+    _events: deque[tuple[str, int, int]]
+    _font: pg.font.Font | None
+
+    def __init__(self) -> None:
+        self.enabled = GameSettings.PROFILER
+        self.show_overlay = False
+        self._stack = []
+        self._frame_start = None
+        self._frame_totals = {}
+        self._samples = {}
+        self._frames = deque(maxlen=WINDOW_FRAMES)
+        self._events = deque(maxlen=TRACE_EVENTS)
+        self._font = None
+
+    # Recording
+    def begin_frame(self) -> None:
+        if not self.enabled:
+            return
+        self._frame_start = time.perf_counter_ns()
+        self._frame_totals.clear()
+
+    def end_frame(self) -> None:
+        if not self.enabled or self._frame_start is None:
+            return
+        now = time.perf_counter_ns()
+        self._events.append(("frame", self._frame_start, now - self._frame_start))
+        self._frames.append((now - self._frame_start) / 1e6)
+        for name, ms in self._frame_totals.items():
+            if name not in self._samples:
+                self._samples[name] = deque(maxlen=WINDOW_FRAMES)
+            self._samples[name].append(ms)
+        self._frame_start = None
+
+    def begin(self, name: str) -> None:
+        if self.enabled:
+            self._stack.append((name, time.perf_counter_ns()))
+
+    def end(self) -> None:
+        if not self.enabled or not self._stack:
+            return
+        name, start = self._stack.pop()
+        duration = time.perf_counter_ns() - start
+        self._frame_totals[name] = self._frame_totals.get(name, 0.0) + duration / 1e6
+        self._events.append((name, start, duration))
+
+    @contextmanager
+    def section(self, name: str) -> Iterator[None]:
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end()
+
+    def reset(self) -> None:
+        """Drop every sample and trace event recorded so far"""
+        self._stack.clear()
+        self._frame_start = None
+        self._frame_totals.clear()
+        self._samples.clear()
+        self._frames.clear()
+        self._events.clear()
+
+    # Reporting
+    def last_frame(self) -> dict[str, float]:
+        """Milliseconds spent in each section during the most recent frame"""
+        return dict(self._frame_totals)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """p50/p95/p99 in milliseconds of the whole frame and of each section"""
+        result: dict[str, dict[str, float]] = {}
+        for name, samples in [("frame", self._frames), *self._samples.items()]:
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            result[name] = {
+                "p50": round(_percentile(ordered, 0.50), 3),
+                "p95": round(_percentile(ordered, 0.95), 3),
+                "p99": round(_percentile(ordered, 0.99), 3),
+            }
+        return result
+
+    def dump_trace(self, path: str = "") -> None:
+        """Write the recorded sections as Chrome trace JSON (chrome://tracing, Perfetto)"""
+        path = path or GameSettings.PROFILER_TRACE
+        pid = os.getpid()
+        events = [
+            {"name": name, "cat": "frame", "ph": "X", "ts": start / 1000, "dur": duration / 1000, "pid": pid, "tid": 1}
+            for name, start, duration in self._events
+        ]
+        try:
+            with open(path, "w") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        except OSError as e:
+            Logger.error(f"Failed to write trace: {e}")
+            return
+        Logger.info(f"Wrote {len(events)} trace events to {path}")
+
+    def draw(self, screen: pg.Surface) -> None:
+        """Percentile table and a graph of recent frame times in the top-left corner"""
+        if not self.enabled or not self.show_overlay:
+            return
+        if self._font is None:
+            self._font = pg.font.Font(None, 20)
+        rows = [("section (ms)", "p50", "p95", "p99")]
+        for name, stats in self.summary().items():
+            rows.append((name, f"{stats['p50']:.2f}", f"{stats['p95']:.2f}", f"{stats['p99']:.2f}"))
+        line_h = self._font.get_linesize()
+        graph_h = 60
+        width = 300
+        height = line_h * len(rows) + graph_h + 15
+        panel = pg.Surface((width, height), pg.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        for i, (name, *values) in enumerate(rows):
+            y = 5 + i * line_h
+            panel.blit(self._font.render(name, True, (255, 255, 255)), (5, y))
+            # Numbers are right-aligned in fixed columns
+            for right, value in zip((170, 230, 290), values):
+                text = self._font.render(value, True, (255, 255, 255))
+                panel.blit(text, (right - text.get_width(), y))
+
+        # One bar per frame, the line marks the frame budget at the target FPS
+        top = line_h * len(rows) + 10
+        budget = 1000.0 / GameSettings.FPS
+        scale = graph_h / (budget * 2)
+        frames = list(self._frames)[-(width - 10):]
+        for i, ms in enumerate(frames):
+            bar = min(graph_h, int(ms * scale))
+            color = (80, 220, 80) if ms <= budget else (230, 80, 60)
+            pg.draw.line(panel, color, (5 + i, top + graph_h), (5 + i, top + graph_h - bar))
+        pg.draw.line(panel, (255, 255, 0), (5, top + graph_h // 2), (width - 5, top + graph_h // 2))
+        screen.blit(panel, (10, 10))
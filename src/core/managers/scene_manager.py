@@ -7,12 +7,22 @@ class SceneManager:
     
     _scenes: dict[str, Scene]
     _current_scene: Scene | None = None
+    _current_name: str | None = None
     _next_scene: str | None = None
+    _full_redraw: bool = True
     
     def __init__(self):
         Logger.info("Initializing SceneManager")
         self._scenes = {}
         
+    @property
+    def current_scene(self) -> Scene | None:
+        return self._current_scene
+
+    @property
+    def current_scene_name(self) -> str | None:
+        return self._current_name
+
     def register_scene(self, name: str, scene: Scene) -> None:
         self._scenes[name] = scene
         
@@ -35,6 +45,16 @@ class SceneManager:
     def draw(self, screen: pg.Surface) -> None:
         if self._current_scene:
             self._current_scene.draw(screen)
+
+    def dirty_rects(self) -> list[pg.Rect] | None:
+        if self._current_scene is None:
+            return None
+        # Always ask the scene, so its layers stay in step with what is on screen
+        rects = self._current_scene.dirty_rects()
+        if self._full_redraw:
+            self._full_redraw = False
+            return None
+        return rects
             
     def _perform_scene_switch(self) -> None:
         if self._next_scene is None:
@@ -45,6 +65,7 @@ class SceneManager:
             self._current_scene.exit()
         
         self._current_scene = self._scenes[self._next_scene]
+        self._current_name = self._next_scene
         
         # Enter new scene
         if self._current_scene:
@@ -53,4 +74,6 @@ class SceneManager:
             
         # Clear the transition request
         self._next_scene = None
+        # The screen still shows the previous scene
+        self._full_redraw = True
         
\ No newline at end of file
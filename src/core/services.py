@@ -1,6 +1,7 @@
-from .managers import InputManager, ResourceManager, SceneManager, SoundManager,GameManager
+from .managers import InputManager, ResourceManager, SceneManager, SoundManager,GameManager, Profiler
 
 input_manager = InputManager()
 resource_manager = ResourceManager()
 scene_manager = SceneManager()
 sound_manager = SoundManager()
+profiler = Profiler()
@@ -122,6 +122,12 @@ class ChatOverlay(UIComponent):
             self._cursor_timer = 0.0
             self._cursor_visible = not self._cursor_visible
 
+    def frame_key(self) -> tuple:
+        """Everything draw() depends on, for dirty-rect rendering"""
+        msgs = self._get_messages(8) if self._get_messages else []
+        lines = tuple((m.get("id"), m.get("from"), m.get("text")) for m in list(msgs)[-8:])
+        return (self.is_open, self._input_text, self._cursor_visible, lines)
+
     def draw(self, screen: pg.Surface) -> None:
         # Always draw recent messages faintly, even when closed
         msgs = self._get_messages(8) if self._get_messages else []
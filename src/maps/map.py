@@ -1,58 +1,163 @@
+import math
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+
 import pygame as pg
 import pytmx
 
-from src.utils import load_tmx, Position, GameSettings, PositionCamera, Teleport
+from src.utils import parse_tmx, Logger, Position, GameSettings, PositionCamera, Teleport
+from src.maps import map_cache
+from src.maps.map_cache import BakedMap
+
+# Scaled tile images shared by every map, keyed by (tileset image, local tile id, flip flags, size)
+_SCALED_TILES: dict[tuple, pg.Surface] = {}
 
 
 class Map:
     # Map Properties
     path_name: str
-    tmxdata: pytmx.TiledMap
     # Position Argument
     spawn: Position
     teleporters: list[Teleport]
     # Rendering Properties
-    _surface: pg.Surface
-    _collision_map: list[pg.Rect]
-    _bush_map: list[pg.Rect]
+    _chunks: OrderedDict[tuple[int, int], pg.Surface]
+    _chunk_px: int
+    _minimap: pg.Surface | None
+    # Palette indices of every visible tile layer, and the palette at each drawn size
+    _layers: list[array]
+    _palettes: dict[int, list[pg.Surface | None]]
+    # Tile-indexed occupancy grids (one byte per tile, row-major)
+    _grid_width: int
+    _grid_height: int
+    _collision_map: bytearray
+    _bush_map: bytearray
+    _teleport_map: dict[tuple[int, int], list[int]]
     
 
-    def __init__(self, path: str, tp: list[Teleport], spawn: Position):
+    def __init__(self, path: str, tp: list[Teleport], spawn: Position, baked: BakedMap | None = None):
         self.path_name = path
-        self.tmxdata = load_tmx(path)
         self.spawn = spawn
         self.teleporters = tp
 
-        pixel_w = self.tmxdata.width * GameSettings.TILE_SIZE
-        pixel_h = self.tmxdata.height * GameSettings.TILE_SIZE
+        # baked is passed in when the map was prepared ahead of time
+        self._apply(baked if baked is not None else Map.prepare(path))
+
+        # Chunks of the map are drawn the first time the camera sees them
+        self._chunks = OrderedDict()
+        self._chunk_px = GameSettings.MAP_CHUNK_TILES * GameSettings.TILE_SIZE
+        self._minimap = None
+        # Index teleporters by the tiles they cover
+        self._teleport_map = self._create_teleport_map()
+
+    @property
+    def width(self) -> int:
+        """Width of the map in tiles"""
+        return self._grid_width
+
+    @property
+    def height(self) -> int:
+        """Height of the map in tiles"""
+        return self._grid_height
+
+    @property
+    def collision_grid(self) -> bytearray:
+        """One byte per tile, row-major, non-zero where the tile blocks movement"""
+        return self._collision_map
+
+    @staticmethod
+    def prepare(path: str) -> BakedMap:
+        '''
+        Everything about a map that doesn't need the display, from the on-disk cache
+        or parsed and baked on a miss. Safe to call off the main thread
+        '''
+        size = GameSettings.TILE_SIZE
+        # Warm starts skip pytmx and tile scaling entirely
+        key = map_cache.cache_key(path, size)
+        baked = map_cache.load(key) if key else None
+        if baked is not None:
+            Logger.info(f"Loaded baked map from cache: {path}")
+            return baked
+        baked = Map._bake(parse_tmx(path), size)
+        if key:
+            map_cache.store(key, baked)
+        return baked
 
-        # Prebake the map
-        self._surface = pg.Surface((pixel_w, pixel_h), pg.SRCALPHA)
-        self._render_all_layers(self._surface)
-        # Prebake the collision map
-        self._collision_map = self._create_collision_map()
-        # Prebake the bush map
-        self._bush_map = self._create_bush_map()
+    @staticmethod
+    def _bake(tmxdata: pytmx.TiledMap, size: int) -> BakedMap:
+        '''
+        Reduce the parsed TMX to what drawing and collision need: a palette of scaled tiles,
+        per-layer palette indices, and the collision and bush grids
+        '''
+        palette: list[bytes] = [b""]
+        index_of: dict[int, int] = {0: 0}
+        layers: list[array] = []
+        for layer in tmxdata.visible_layers:
+            if not isinstance(layer, pytmx.TiledTileLayer):
+                continue
+            cells = array("H")
+            for row in layer.data:
+                for gid in row:
+                    idx = index_of.get(gid)
+                    if idx is None:
+                        image = Map._scaled_tile(tmxdata, gid, size)
+                        idx = 0
+                        if image is not None:
+                            idx = len(palette)
+                            palette.append(pg.image.tobytes(image, "RGBA"))
+                        index_of[gid] = idx
+                    cells.append(idx)
+            layers.append(cells)
+        return BakedMap(
+            tmxdata.width, tmxdata.height, size,
+            bytes(Map._create_collision_map(tmxdata)), bytes(Map._create_bush_map(tmxdata)),
+            layers, palette
+        )
+
+    def _apply(self, baked: BakedMap) -> None:
+        '''
+        Build the map's surfaces from baked data, converted to the display format (main thread only)
+        '''
+        self._grid_width = baked.width
+        self._grid_height = baked.height
+        self._collision_map = bytearray(baked.collision)
+        self._bush_map = bytearray(baked.bush)
+        self._layers = baked.layers
+        convert = pg.display.get_surface() is not None
+        tiles: list[pg.Surface | None] = [None]
+        for raw in baked.palette[1:]:
+            image = pg.image.frombytes(raw, (baked.tile_size, baked.tile_size), "RGBA")
+            tiles.append(image.convert_alpha() if convert else image)
+        self._palettes = {baked.tile_size: tiles}
 
     def update(self, dt: float):
         return
 
     def draw(self, screen: pg.Surface, camera: PositionCamera):
-        screen.blit(self._surface, camera.transform_position(Position(0, 0)))
+        view = pg.Rect(camera.x, camera.y, screen.get_width(), screen.get_height())
+        for cx, cy in self._chunks_in_rect(view):
+            screen.blit(self._get_chunk(cx, cy), camera.transform_position(Position(cx * self._chunk_px, cy * self._chunk_px)))
         
         # Draw the hitboxes collision map
         if GameSettings.DRAW_HITBOXES:
-            for rect in self._collision_map:
-                pg.draw.rect(screen, (255, 0, 0), camera.transform_rect(rect), 1)
+            for tx, ty in self._tiles_in_rect(view):
+                if self._collision_map[ty * self._grid_width + tx]:
+                    tile_rect = pg.Rect(
+                        tx * GameSettings.TILE_SIZE,
+                        ty * GameSettings.TILE_SIZE,
+                        GameSettings.TILE_SIZE,
+                        GameSettings.TILE_SIZE
+                    )
+                    pg.draw.rect(screen, (255, 0, 0), camera.transform_rect(tile_rect), 1)
         
     def check_collision(self, rect: pg.Rect) -> bool:
         '''
         [TODO HACKATHON 4]
         Return True if collide if rect param collide with self._collision_map
-        Hint: use API colliderect and iterate each rectangle to check
+        Only the tiles overlapped by rect are looked up in the grid
         '''
-        for tile_rect in self._collision_map:
-            if rect.colliderect(tile_rect):
+        for tx, ty in self._tiles_in_rect(rect):
+            if self._collision_map[ty * self._grid_width + tx]:
                 return True
         return False
     
@@ -60,11 +165,19 @@ class Map:
         '''
         Check if player rect is on a bush tile
         '''
-        for bush_rect in self._bush_map:
-            if rect.colliderect(bush_rect):
+        for tx, ty in self._tiles_in_rect(rect):
+            if self._bush_map[ty * self._grid_width + tx]:
                 return True
         return False
 
+    def is_blocked(self, tx: int, ty: int) -> bool:
+        '''
+        Check a single tile of the collision grid, tiles outside the map are not blocked
+        '''
+        if tx < 0 or ty < 0 or tx >= self._grid_width or ty >= self._grid_height:
+            return False
+        return bool(self._collision_map[ty * self._grid_width + tx])
+
         
     def check_teleport(self, pos: Position) -> Teleport | None:
         '''[TODO HACKATHON 6] 
@@ -72,76 +185,174 @@ class Map:
         Hint: Maybe there is an way to switch the map using something from src/core/managers/game_manager.py called switch_... 
         '''
         player_rect = pg.Rect(pos.x, pos.y, GameSettings.TILE_SIZE, GameSettings.TILE_SIZE)
-        for tp in self.teleporters:
-            tp_rect = pg.Rect(
-                tp.pos.x,
-                tp.pos.y,
-                GameSettings.TILE_SIZE,
-                GameSettings.TILE_SIZE
-            )
-            if player_rect.colliderect(tp_rect):
-                return tp
-        return None
-
-
-
-    def _render_all_layers(self, target: pg.Surface) -> None:
-        for layer in self.tmxdata.visible_layers:
-            if isinstance(layer, pytmx.TiledTileLayer):
-                self._render_tile_layer(target, layer)
-            # elif isinstance(layer, pytmx.TiledImageLayer) and layer.image:
-            #     target.blit(layer.image, (layer.x or 0, layer.y or 0))
- 
-    def _render_tile_layer(self, target: pg.Surface, layer: pytmx.TiledTileLayer) -> None:
-        for x, y, gid in layer:
-            if gid == 0:
-                continue
-            image = self.tmxdata.get_tile_image_by_gid(gid)
-            if image is None:
-                continue
+        # Earlier teleporters in the list win, same as a linear scan would
+        best: int | None = None
+        for tile in self._tiles_in_rect(player_rect):
+            for idx in self._teleport_map.get(tile, ()):
+                if best is not None and idx >= best:
+                    continue
+                if player_rect.colliderect(self._teleport_rect(self.teleporters[idx])):
+                    best = idx
+        if best is None:
+            return None
+        return self.teleporters[best]
+
+    def _tiles_in_rect(self, rect: pg.Rect):
+        '''
+        Yield the (tx, ty) tiles inside the map that rect overlaps
+        '''
+        if rect.width <= 0 or rect.height <= 0:
+            return
+        size = GameSettings.TILE_SIZE
+        x0 = max(rect.left // size, 0)
+        y0 = max(rect.top // size, 0)
+        x1 = min((rect.right - 1) // size, self._grid_width - 1)
+        y1 = min((rect.bottom - 1) // size, self._grid_height - 1)
+        for ty in range(y0, y1 + 1):
+            for tx in range(x0, x1 + 1):
+                yield tx, ty
+
+    @staticmethod
+    def _teleport_rect(tp: Teleport) -> pg.Rect:
+        return pg.Rect(tp.pos.x, tp.pos.y, GameSettings.TILE_SIZE, GameSettings.TILE_SIZE)
+
+    def _chunks_in_rect(self, rect: pg.Rect):
+        '''
+        Yield the (cx, cy) chunks inside the map that rect overlaps
+        '''
+        if rect.width <= 0 or rect.height <= 0:
+            return
+        tiles = GameSettings.MAP_CHUNK_TILES
+        x0 = max(rect.left // self._chunk_px, 0)
+        y0 = max(rect.top // self._chunk_px, 0)
+        x1 = min((rect.right - 1) // self._chunk_px, (self._grid_width - 1) // tiles)
+        y1 = min((rect.bottom - 1) // self._chunk_px, (self._grid_height - 1) // tiles)
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                yield cx, cy
 
-            image = pg.transform.scale(image, (GameSettings.TILE_SIZE, GameSettings.TILE_SIZE))
-            target.blit(image, (x * GameSettings.TILE_SIZE, y * GameSettings.TILE_SIZE))
+    def _get_chunk(self, cx: int, cy: int) -> pg.Surface:
+        chunk = self._chunks.get((cx, cy))
+        if chunk is not None:
+            self._chunks.move_to_end((cx, cy))
+            return chunk
+        tiles = GameSettings.MAP_CHUNK_TILES
+        x0, y0 = cx * tiles, cy * tiles
+        x1 = min(x0 + tiles, self._grid_width)
+        y1 = min(y0 + tiles, self._grid_height)
+        size = GameSettings.TILE_SIZE
+        chunk = pg.Surface(((x1 - x0) * size, (y1 - y0) * size), pg.SRCALPHA)
+        self._render_region(chunk, x0, y0, x1, y1, size)
+        self._chunks[(cx, cy)] = chunk
+        # Keep memory proportional to the area recently on screen
+        while len(self._chunks) > GameSettings.MAP_CHUNK_CACHE:
+            self._chunks.popitem(last=False)
+        return chunk
+
+    def release_graphics(self) -> None:
+        '''
+        Drop the baked chunks, the minimap and resized palettes, they are rebuilt on the next draw
+        '''
+        self._chunks.clear()
+        self._minimap = None
+        self._palettes = {GameSettings.TILE_SIZE: self._palettes[GameSettings.TILE_SIZE]}
+
+    def minimap(self, size: tuple[int, int]) -> pg.Surface:
+        '''
+        The whole map scaled down to size, rendered straight from the tiles at low resolution
+        '''
+        if self._minimap is None or self._minimap.get_size() != size:
+            tile = max(1, math.ceil(max(size[0] / self._grid_width, size[1] / self._grid_height)))
+            surface = pg.Surface((self._grid_width * tile, self._grid_height * tile), pg.SRCALPHA)
+            self._render_region(surface, 0, 0, self._grid_width, self._grid_height, tile)
+            self._minimap = pg.transform.smoothscale(surface, size)
+        return self._minimap
+
+    def _render_region(self, target: pg.Surface, x0: int, y0: int, x1: int, y1: int, size: int) -> None:
+        '''
+        Draw tiles [x0, x1) x [y0, y1) of every visible tile layer, at size pixels per tile, with (x0, y0) at the origin
+        '''
+        palette = self._palette(size)
+        width = self._grid_width
+        for layer in self._layers:
+            for y in range(y0, y1):
+                row = y * width
+                for x in range(x0, x1):
+                    image = palette[layer[row + x]]
+                    if image is not None:
+                        target.blit(image, ((x - x0) * size, (y - y0) * size))
+
+    def _palette(self, size: int) -> list[pg.Surface | None]:
+        palette = self._palettes.get(size)
+        if palette is None:
+            base = self._palettes[GameSettings.TILE_SIZE]
+            palette = [None if image is None else pg.transform.scale(image, (size, size)) for image in base]
+            self._palettes[size] = palette
+        return palette
+
+    @staticmethod
+    def _scaled_tile(tmxdata: pytmx.TiledMap, gid: int, size: int) -> pg.Surface | None:
+        '''
+        The tile image for gid at size pixels, scaled once per tileset tile
+        '''
+        image = tmxdata.get_tile_image_by_gid(gid)
+        if image is None:
+            return None
+        # gids are numbered per map, the tileset tile behind them is what repeats across maps
+        tiled_gid = tmxdata.tiledgidmap.get(gid, gid)
+        tileset = tmxdata.get_tileset_from_gid(gid)
+        flags = next((f for g, f in tmxdata.gidmap.get(tiled_gid, ()) if g == gid), None)
+        key = (tileset.source, tiled_gid - tileset.firstgid, flags, size)
+        scaled = _SCALED_TILES.get(key)
+        if scaled is None:
+            scaled = pg.transform.scale(image, (size, size))
+            _SCALED_TILES[key] = scaled
+        return scaled
     
-    def _create_collision_map(self) -> list[pg.Rect]:
-        rects = []
-        for layer in self.tmxdata.visible_layers:
+    @staticmethod
+    def _create_collision_map(tmxdata: pytmx.TiledMap) -> bytearray:
+        grid = bytearray(tmxdata.width * tmxdata.height)
+        for layer in tmxdata.visible_layers:
             if isinstance(layer, pytmx.TiledTileLayer) and ("collision" in layer.name.lower() or "house" in layer.name.lower()):
                 for x, y, gid in layer:
                     if gid != 0:
                         '''
                         [TODO HACKATHON 4]
-                        rects.append(pg.Rect(...))
-                        Append the collision rectangle to the rects[] array
-                        Remember scale the rectangle with the TILE_SIZE from settings
+                        Mark the collision tile in the grid
+                        Tile coordinates are scaled with TILE_SIZE at query time
                         '''
+                        grid[y * tmxdata.width + x] = 1
 
-                        rects.append(pg.Rect(x * GameSettings.TILE_SIZE,y * GameSettings.TILE_SIZE,GameSettings.TILE_SIZE,GameSettings.TILE_SIZE))
-
-        return rects
+        return grid
     
-    def _create_bush_map(self) -> list[pg.Rect]:
+    @staticmethod
+    def _create_bush_map(tmxdata: pytmx.TiledMap) -> bytearray:
         '''
-        Create a list of rectangles representing bush tiles
+        Create an occupancy grid marking bush tiles
         '''
-        rects = []
-        for layer in self.tmxdata.visible_layers:
+        grid = bytearray(tmxdata.width * tmxdata.height)
+        for layer in tmxdata.visible_layers:
             if isinstance(layer, pytmx.TiledTileLayer) and "bush" in layer.name.lower():
                 for x, y, gid in layer:
                     if gid != 0:
-                        rects.append(pg.Rect(
-                            x * GameSettings.TILE_SIZE,
-                            y * GameSettings.TILE_SIZE,
-                            GameSettings.TILE_SIZE,
-                            GameSettings.TILE_SIZE
-                        ))
-        return rects
+                        grid[y * tmxdata.width + x] = 1
+        return grid
+
+    def _create_teleport_map(self) -> dict[tuple[int, int], list[int]]:
+        '''
+        Map each tile to the indices of the teleporters overlapping it
+        '''
+        index: dict[tuple[int, int], list[int]] = {}
+        for i, tp in enumerate(self.teleporters):
+            for tile in self._tiles_in_rect(self._teleport_rect(tp)):
+                index.setdefault(tile, []).append(i)
+        return index
 
     @classmethod
-    def from_dict(cls, data: dict) -> "Map":
+    def from_dict(cls, data: dict, baked: BakedMap | None = None) -> "Map":
         tp = [Teleport.from_dict(t) for t in data["teleport"]]
         pos = Position(data["player"]["x"] * GameSettings.TILE_SIZE, data["player"]["y"] * GameSettings.TILE_SIZE)
-        return cls(data["path"], tp, pos)
+        return cls(data["path"], tp, pos, baked)
 
     def to_dict(self):
         return {
@@ -152,3 +363,27 @@ class Map:
                 "y": self.spawn.y // GameSettings.TILE_SIZE,
             }
         }
+
+
+# Compared and hashed by identity, the pathfinder caches walk grids per object
+@dataclass(eq=False)
+class MapLayout:
+    """
+    The parts of a map route planning needs: teleporters, spawn and the collision grid
+
+    Built from the save entry and the baked map (usually the on-disk cache), so
+    routing through a map never creates its surfaces.
+    """
+    path_name: str
+    spawn: Position
+    teleporters: list[Teleport]
+    width: int
+    height: int
+    collision_grid: bytes
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MapLayout":
+        tp = [Teleport.from_dict(t) for t in data["teleport"]]
+        pos = Position(data["player"]["x"] * GameSettings.TILE_SIZE, data["player"]["y"] * GameSettings.TILE_SIZE)
+        baked = Map.prepare(data["path"])
+        return cls(data["path"], pos, tp, baked.width, baked.height, baked.collision)
@@ -0,0 +1,150 @@
+"""
+On-disk cache of baked maps.
+
+A baked map is what Map needs to draw and collide without pytmx: the tile
+palette already scaled to TILE_SIZE (raw RGBA), one array of palette indices
+per visible tile layer, and the collision and bush grids. Entries are keyed
+by a hash of the .tmx, every .tsx and image it references, and TILE_SIZE, so
+editing any asset or the tile size simply misses the cache.
+
+File layout: MAGIC, format version (u16), header length (u32), JSON header,
+then the collision grid, the bush grid, each layer (u16 little-endian per
+tile) and each palette tile, back to back.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.utils import Logger
+from src.utils.loader import ASSETS_DIR
+
+CACHE_DIR = Path(".cache") / "maps"
+MAGIC = b"MGMC"
+VERSION = 1
+_PREAMBLE = struct.Struct("<4sHI")
+
+
+@dataclass
+class BakedMap:
+    width: int
+    height: int
+    tile_size: int
+    collision: bytes
+    bush: bytes
+    # Palette indices, row-major, 0 = empty
+    layers: list[array]
+    # Raw RGBA pixels of each palette entry, index 0 is unused
+    palette: list[bytes]
+
+
+def _referenced_files(path: Path) -> list[Path]:
+    """The .tsx files and images a map depends on, in document order"""
+    files: list[Path] = []
+    pending = [path]
+    while pending:
+        current = pending.pop(0)
+        root = ET.parse(current).getroot()
+        for element in root.iter():
+            source = element.get("source")
+            if source is None or element.tag not in ("tileset", "image"):
+                continue
+            ref = (current.parent / source).resolve()
+            if ref not in files:
+                files.append(ref)
+                if ref.suffix == ".tsx":
+                    pending.append(ref)
+    return files
+
+
+def cache_key(path: str, tile_size: int) -> str | None:
+    """Content hash of a map and everything it references, None if the files can't be read"""
+    tmx = ASSETS_DIR / "maps" / path
+    digest = hashlib.sha256(f"v{VERSION}:{tile_size}:".encode())
+    try:
+        for file in [tmx] + _referenced_files(tmx):
+            digest.update(file.name.encode())
+            digest.update(file.read_bytes())
+    except (OSError, ET.ParseError) as e:
+        Logger.warning(f"Map cache disabled for {path}: {e}")
+        return None
+    return digest.hexdigest()
+
+
+def load(key: str) -> BakedMap | None:
+    file = CACHE_DIR / f"{key}.bin"
+    try:
+        data = file.read_bytes()
+    except OSError:
+        return None
+    try:
+        magic, version, header_len = _PREAMBLE.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            return None
+        offset = _PREAMBLE.size
+        header = json.loads(data[offset:offset + header_len])
+        offset += header_len
+        width, height, tile_size = header["width"], header["height"], header["tile_size"]
+        cells = width * height
+
+        def take(size: int) -> bytes:
+            nonlocal offset
+            if offset + size > len(data):
+                raise ValueError("truncated")
+            chunk = data[offset:offset + size]
+            offset += size
+            return chunk
+
+        collision = take(cells)
+        bush = take(cells)
+        layers = []
+        for _ in range(header["layers"]):
+            layer = array("H")
+            layer.frombytes(take(cells * 2))
+            if sys.byteorder != "little":
+                layer.byteswap()
+            layers.append(layer)
+        palette = [b""] + [take(tile_size * tile_size * 4) for _ in range(header["palette"] - 1)]
+        return BakedMap(width, height, tile_size, collision, bush, layers, palette)
+    except (struct.error, ValueError, KeyError) as e:
+        Logger.warning(f"Ignoring corrupt map cache {file}: {e}")
+        return None
+
+
+def store(key: str, baked: BakedMap) -> None:
+    header = json.dumps({
+        "width": baked.width,
+        "height": baked.height,
+        "tile_size": baked.tile_size,
+        "layers": len(baked.layers),
+        "palette": len(baked.palette),
+    }).encode()
+    parts = [_PREAMBLE.pack(MAGIC, VERSION, len(header)), header, baked.collision, baked.bush]
+    for layer in baked.layers:
+        if sys.byteorder != "little":
+            layer = array("H", layer)
+            layer.byteswap()
+        parts.append(layer.tobytes())
+    parts.extend(baked.palette[1:])
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Write then rename so a crash never leaves a half-written entry behind
+        fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    except OSError as e:
+        Logger.warning(f"Could not write map cache: {e}")
+        return
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"".join(parts))
+        os.replace(tmp, CACHE_DIR / f"{key}.bin")
+    except OSError as e:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        Logger.warning(f"Could not write map cache: {e}")
@@ -0,0 +1,67 @@
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from src.utils import GameSettings, Logger, Position
+from src.maps.map import Map
+from src.maps.map_cache import BakedMap
+from src.maps.map_store import MapStore
+
+# One background thread shared by every save, maps are prepared one at a time
+_WORKER: ThreadPoolExecutor | None = None
+
+
+def _worker() -> ThreadPoolExecutor:
+    global _WORKER
+    if _WORKER is None:
+        _WORKER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="MapPrefetch")
+    return _WORKER
+
+
+class MapPrefetcher:
+    """
+    Loads the destinations of nearby teleporters before the player steps on them
+
+    Reading the disk cache, or parsing and baking the TMX on a miss, happens on a
+    worker thread. Once that is done the main thread only has to turn the baked
+    tiles into display-format surfaces, one map per update.
+    """
+    _maps: MapStore
+    _pending: dict[str, Future[BakedMap]]
+
+    def __init__(self, maps: MapStore) -> None:
+        self._maps = maps
+        self._pending = {}
+
+    def update(self, current: Map, position: Position) -> None:
+        """Queue the destinations within reach of position, and finish one that is ready"""
+        reach = GameSettings.MAP_PREFETCH_DISTANCE * GameSettings.TILE_SIZE
+        for tp in current.teleporters:
+            target = tp.destination
+            if target in self._pending or target not in self._maps or self._maps.is_loaded(target):
+                continue
+            # Distance from the player to the teleporter's tile, 0 when inside it
+            dx = max(tp.pos.x - position.x, 0, position.x - (tp.pos.x + GameSettings.TILE_SIZE))
+            dy = max(tp.pos.y - position.y, 0, position.y - (tp.pos.y + GameSettings.TILE_SIZE))
+            if dx * dx + dy * dy <= reach * reach:
+                Logger.info(f"Prefetching map {target}")
+                self._pending[target] = _worker().submit(Map.prepare, target)
+
+        for target, future in self._pending.items():
+            if future.done():
+                self._finish(target)
+                break
+
+    def finish(self, target: str) -> None:
+        """Wait for a map that is being prefetched, so switching to it doesn't load it a second time"""
+        if target in self._pending:
+            self._finish(target)
+
+    def _finish(self, target: str) -> None:
+        future = self._pending.pop(target)
+        try:
+            baked = future.result()
+        except Exception as e:
+            # Loading it on first use will report the problem properly
+            Logger.warning(f"Prefetching map {target} failed: {e}")
+            return
+        self._maps.add_prepared(target, baked)
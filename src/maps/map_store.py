@@ -0,0 +1,86 @@
+from __future__ import annotations
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Iterator
+
+from src.utils import GameSettings, Logger
+from src.maps.map import Map, MapLayout
+from src.maps.map_cache import BakedMap
+
+
+class MapStore(Mapping[str, Map]):
+    """
+    The maps of a save, built on first access
+
+    Every map is described by its save entry up front, but the Map itself is
+    only created when something looks it up. The most recently visited maps
+    keep their baked chunks; older ones drop them and re-bake on demand.
+    """
+    _entries: dict[str, dict]
+    _loaded: dict[str, Map]
+    _recent: OrderedDict[str, None]
+    _layouts: dict[str, MapLayout]
+
+    def __init__(self, entries: list[dict]) -> None:
+        self._entries = {entry["path"]: entry for entry in entries}
+        self._loaded = {}
+        self._recent = OrderedDict()
+        self._layouts = {}
+
+    def __getitem__(self, key: str) -> Map:
+        m = self._loaded.get(key)
+        if m is None:
+            entry = self._entries[key]
+            Logger.info(f"Loading map {key}")
+            m = self._loaded[key] = Map.from_dict(entry)
+            self._layouts.pop(key, None)
+        return m
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_loaded(self, key: str) -> bool:
+        return key in self._loaded
+
+    def add_prepared(self, key: str, baked: BakedMap) -> Map:
+        """Build a map from data prepared ahead of time, unless it got loaded meanwhile"""
+        m = self._loaded.get(key)
+        if m is None:
+            m = self._loaded[key] = Map.from_dict(self._entries[key], baked)
+            self._layouts.pop(key, None)
+        return m
+
+    def visit(self, key: str) -> Map:
+        """Mark a map as current and release the graphics of maps not visited lately"""
+        m = self[key]
+        self._recent[key] = None
+        self._recent.move_to_end(key)
+        while len(self._recent) > max(1, GameSettings.MAP_GRAPHICS_CACHE):
+            old, _ = self._recent.popitem(last=False)
+            if old in self._loaded:
+                self._loaded[old].release_graphics()
+        return m
+
+    def layout(self, key: str) -> Map | MapLayout:
+        """What route planning needs of a map, without loading it if it was never used"""
+        m = self._loaded.get(key)
+        if m is not None:
+            return m
+        layout = self._layouts.get(key)
+        if layout is None:
+            layout = self._layouts[key] = MapLayout.from_dict(self._entries[key])
+        return layout
+
+    def describe(self, key: str) -> dict:
+        """Save block of a map, without loading it if it was never used"""
+        m = self._loaded.get(key)
+        if m is not None:
+            return m.to_dict()
+        entry = self._entries[key]
+        return {"path": entry["path"], "teleport": entry["teleport"], "player": entry["player"]}
@@ -0,0 +1,118 @@
+from __future__ import annotations
+import heapq
+import weakref
+from collections import OrderedDict
+from typing import Iterable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.maps.map import Map, MapLayout
+
+Tile = tuple[int, int]
+
+NEIGHBOURS: tuple[Tile, ...] = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+class _WalkGrid:
+    """
+    Static walkability of one map plus the memoized paths computed on it
+    """
+    width: int
+    height: int
+    walls: bytes
+    results: OrderedDict[tuple[Tile, Tile, frozenset[Tile]], list[Tile] | None]
+
+    def __init__(self, map_obj: Map | MapLayout) -> None:
+        self.width = map_obj.width
+        self.height = map_obj.height
+        # Snapshot the collision grid so memoized paths can never go stale
+        self.walls = bytes(map_obj.collision_grid)
+        self.results = OrderedDict()
+
+
+class Pathfinder:
+    """
+    A* search over the tile grid of a map
+
+    The static collision grid is cached once per Map object, NPC tiles are
+    layered on top for each query, and recent (start, goal, blockers)
+    results are kept in a small LRU so repeated clicks cost nothing.
+    """
+    _grids: weakref.WeakKeyDictionary[Map | MapLayout, _WalkGrid]
+    _cache_size: int
+
+    def __init__(self, cache_size: int = 32) -> None:
+        self._grids = weakref.WeakKeyDictionary()
+        self._cache_size = cache_size
+
+    def find_path(self, map_obj: Map | MapLayout, start: Tile, goal: Tile,
+                  blockers: Iterable[Tile] = ()) -> list[Tile] | None:
+        """
+        Return the tiles from start to goal (both included), or None if the goal can't be reached
+        """
+        grid = self._grid_for(map_obj)
+        start = (int(start[0]), int(start[1]))
+        goal = (int(goal[0]), int(goal[1]))
+        dynamic = frozenset((int(x), int(y)) for x, y in blockers)
+
+        key = (start, goal, dynamic)
+        if key in grid.results:
+            grid.results.move_to_end(key)
+            path = grid.results[key]
+            return list(path) if path is not None else None
+
+        path = self._search(grid, start, goal, dynamic)
+        grid.results[key] = path
+        if len(grid.results) > self._cache_size:
+            grid.results.popitem(last=False)
+        return list(path) if path is not None else None
+
+    def invalidate(self, map_obj: Map | MapLayout | None = None) -> None:
+        """Drop cached grids and paths, for one map or for all of them"""
+        if map_obj is None:
+            self._grids.clear()
+        else:
+            self._grids.pop(map_obj, None)
+
+    def _grid_for(self, map_obj: Map | MapLayout) -> _WalkGrid:
+        grid = self._grids.get(map_obj)
+        if grid is None:
+            grid = _WalkGrid(map_obj)
+            self._grids[map_obj] = grid
+        return grid
+
+    @staticmethod
+    def _search(grid: _WalkGrid, start: Tile, goal: Tile, dynamic: frozenset[Tile]) -> list[Tile] | None:
+        width, height, walls = grid.width, grid.height, grid.walls
+        gx, gy = goal
+
+        # Heap entries are (f, g, tile); Manhattan distance is exact on an open 4-way grid
+        open_heap: list[tuple[int, int, Tile]] = [(abs(start[0] - gx) + abs(start[1] - gy), 0, start)]
+        prev: dict[Tile, Tile | None] = {start: None}
+        cost: dict[Tile, int] = {start: 0}
+
+        while open_heap:
+            _, g, cur = heapq.heappop(open_heap)
+            if cur == goal:
+                path: list[Tile] = []
+                node: Tile | None = cur
+                while node is not None:
+                    path.append(node)
+                    node = prev[node]
+                path.reverse()
+                return path
+            if g > cost[cur]:
+                continue
+            x, y = cur
+            for dx, dy in NEIGHBOURS:
+                nx, ny = x + dx, y + dy
+                if nx < 0 or ny < 0 or nx >= width or ny >= height:
+                    continue
+                if walls[ny * width + nx] or (nx, ny) in dynamic:
+                    continue
+                ng = g + 1
+                if ng >= cost.get((nx, ny), ng + 1):
+                    continue
+                cost[(nx, ny)] = ng
+                prev[(nx, ny)] = cur
+                heapq.heappush(open_heap, (ng + abs(nx - gx) + abs(ny - gy), ng, (nx, ny)))
+        return None
@@ -0,0 +1,150 @@
+from __future__ import annotations
+import heapq
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from src.utils import GameSettings, Logger, Position
+from src.maps.pathfinding import Pathfinder, Tile
+
+if TYPE_CHECKING:
+    from src.maps.map import Map, MapLayout
+    from src.maps.map_store import MapStore
+
+# A node is a tile on a map: either a teleporter or the tile a teleporter drops you on
+Node = tuple[str, Tile]
+
+
+@dataclass
+class RouteLeg:
+    map_key: str
+    path: list[Tile]
+
+
+def _to_tile(pos: Position) -> Tile:
+    return (int(pos.x // GameSettings.TILE_SIZE), int(pos.y // GameSettings.TILE_SIZE))
+
+
+class WorldGraph:
+    """
+    Route graph over every map of a save
+
+    Built once from the teleporters of every map: walking edges between the
+    teleporter and arrival tiles of each map carry precomputed path lengths,
+    and every teleporter links to its arrival tile on the destination map. A
+    single find_route call returns the walking path for every map along the way.
+    Maps come in as MapStore.layout, so unvisited maps are never loaded.
+    """
+    _maps: dict[str, Map | MapLayout]
+    _pathfinder: Pathfinder
+    _anchors: dict[str, list[Tile]]
+    _edges: dict[Node, list[tuple[Node, int]]]
+
+    def __init__(self, maps: MapStore, pathfinder: Pathfinder) -> None:
+        self._maps = {key: maps.layout(key) for key in maps}
+        self._pathfinder = pathfinder
+        self._anchors = {}
+        self._edges = {}
+        self._build()
+
+    def _arrival_tile(self, destination: str, target_pos: Position | None) -> Tile:
+        if target_pos is not None:
+            return _to_tile(target_pos)
+        return _to_tile(self._maps[destination].spawn)
+
+    def _build(self) -> None:
+        arrivals: dict[str, list[Tile]] = {key: [] for key in self._maps}
+        for key, m in self._maps.items():
+            for tp in m.teleporters:
+                if tp.destination not in self._maps:
+                    continue
+                arrival = self._arrival_tile(tp.destination, tp.target_pos)
+                arrivals[tp.destination].append(arrival)
+                self._edges.setdefault((key, _to_tile(tp.pos)), []).append(((tp.destination, arrival), 1))
+
+        for key, m in self._maps.items():
+            anchors = list(dict.fromkeys([_to_tile(tp.pos) for tp in m.teleporters] + arrivals[key]))
+            self._anchors[key] = anchors
+            for a in anchors:
+                for b in anchors:
+                    if a == b:
+                        continue
+                    path = self._pathfinder.find_path(m, a, b)
+                    if path is not None:
+                        self._edges.setdefault((key, a), []).append(((key, b), len(path) - 1))
+
+        Logger.info(f"World graph built with {len(self._edges)} nodes")
+
+    def find_route(self, start_map: str, start: Tile, goal_map: str, goal: Tile,
+                   blockers: dict[str, set[Tile]] | None = None) -> list[RouteLeg] | None:
+        """
+        Return the walking legs from start to goal, one per map visited, or None if unreachable
+        """
+        if start_map not in self._maps or goal_map not in self._maps:
+            return None
+        blockers = blockers or {}
+        start = (int(start[0]), int(start[1]))
+        goal = (int(goal[0]), int(goal[1]))
+        start_node: Node = (start_map, start)
+        goal_node: Node = (goal_map, goal)
+
+        # Only the start and goal tiles need fresh intra-map searches
+        def walk_cost(map_key: str, a: Tile, b: Tile) -> int | None:
+            path = self._pathfinder.find_path(self._maps[map_key], a, b)
+            return None if path is None else len(path) - 1
+
+        extra: dict[Node, list[tuple[Node, int]]] = {start_node: []}
+        for anchor in self._anchors[start_map]:
+            cost = walk_cost(start_map, start, anchor)
+            if cost is not None:
+                extra[start_node].append(((start_map, anchor), cost))
+        if start_map == goal_map:
+            cost = walk_cost(start_map, start, goal)
+            if cost is not None:
+                extra[start_node].append((goal_node, cost))
+        for anchor in self._anchors[goal_map]:
+            cost = walk_cost(goal_map, anchor, goal)
+            if cost is not None:
+                extra.setdefault((goal_map, anchor), []).append((goal_node, cost))
+
+        # Dijkstra over the precomputed graph plus the query edges
+        dist: dict[Node, int] = {start_node: 0}
+        prev: dict[Node, Node | None] = {start_node: None}
+        heap: list[tuple[int, Node]] = [(0, start_node)]
+        while heap:
+            d, node = heapq.heappop(heap)
+            if node == goal_node:
+                break
+            if d > dist[node]:
+                continue
+            for nxt, cost in self._edges.get(node, []) + extra.get(node, []):
+                nd = d + cost
+                if nd < dist.get(nxt, nd + 1):
+                    dist[nxt] = nd
+                    prev[nxt] = node
+                    heapq.heappush(heap, (nd, nxt))
+        if goal_node not in prev:
+            return None
+
+        nodes: list[Node] = []
+        cur: Node | None = goal_node
+        while cur is not None:
+            nodes.append(cur)
+            cur = prev[cur]
+        nodes.reverse()
+
+        # Split the node chain into one walk per map, teleport edges mark the boundaries
+        legs: list[RouteLeg] = []
+        leg_start = nodes[0]
+        for a, b in zip(nodes, nodes[1:] + [None]):
+            if b is not None and b[0] == a[0]:
+                continue
+            map_key = leg_start[0]
+            path = self._pathfinder.find_path(
+                self._maps[map_key], leg_start[1], a[1], blockers.get(map_key, ())
+            )
+            if path is None:
+                return None
+            legs.append(RouteLeg(map_key, path))
+            if b is not None:
+                leg_start = b
+        return legs
@@ -1,5 +1,4 @@
 import pygame as pg
-from collections import deque
 import threading
 import time
 import random
@@ -8,10 +7,12 @@ import math
 from src.interface.components import Button
 from src.scenes.scene import Scene
 from src.core import GameManager, OnlineManager
-from src.utils import Logger, PositionCamera, GameSettings, Position
-from src.core.services import sound_manager,scene_manager, input_manager
+from src.utils import Logger, PositionCamera, GameSettings, Position, DirtyRegions
+from src.core.services import sound_manager,scene_manager, input_manager, profiler
 from src.sprites import Sprite
 from src.sprites import Animation
+from src.maps.pathfinding import Pathfinder
+from src.maps.world_graph import WorldGraph, RouteLeg
 from typing import override
 from typing import override, Dict, Tuple
 from src.interface.components.chat_overlay import ChatOverlay
@@ -46,6 +47,7 @@ class GameScene(Scene):
         self._chat_bubbles: Dict[int, Tuple[str, str]] = {}
         self._last_chat_id_seen = 0
         self._online_last_pos: Dict[int, Position] = {}  # Track last known positions of online players
+        self._frame_dt = 0.0
         # Wild pokemon tracking
         self.wild_pokemon_name = None
         self.used_pokemon_names = set()
@@ -56,6 +58,7 @@ class GameScene(Scene):
             self.loaded_player_spawn_pos = self.game_manager.player.position.copy()
         else:
             self.loaded_player_spawn_pos = None
+        self.loaded_player_spawn_map = self.game_manager.current_map_key
         #ingame_setting_button
         self.ingame_setting_button = Button(
             img_path="UI/button_setting.png",
@@ -103,6 +106,12 @@ class GameScene(Scene):
         self.navigation_overlay_active = False
         # navigation path (list of tile coords)
         self.navigation_path: list[tuple[int,int]] = []
+        # Shared A* pathfinder, caches walk grids and recent paths per map
+        self.pathfinder = Pathfinder()
+        # Cross-map route graph, built on first navigation for the loaded save
+        self.world_graph: WorldGraph | None = None
+        # Remaining legs of the current multi-map route
+        self.navigation_route: list[RouteLeg] = []
         # Auto navigation state
         self.auto_navigation_active = False
         self.navigation_current_index = 0  # Track which waypoint we're moving to
@@ -281,6 +290,8 @@ class GameScene(Scene):
         self.minimap_size = 200  # Size of the minimap in pixels
         self.minimap_padding = 20  # Padding from the top-right corner
         self.minimap_border_width = 3  # Border thickness
+        # Dirty-rect tracking, see dirty_rects()
+        self._dirty = DirtyRegions()
     @override
     def on_ingame_setting_click(self):
         self.overlay_active = True
@@ -304,365 +315,95 @@ class GameScene(Scene):
 
     def on_navigation_start_click(self):
         Logger.info("Navigation start clicked")
-        
-        if not self.game_manager.player or not self.game_manager.current_map:
-            return
-        
-        current_map_name = self.game_manager.current_map.path_name
-        
-        # 設置最終目標
-        self.navigation_final_goal = 'start'
-        
-        # 如果不在 map.tmx 上，先導航到返回 map.tmx 的傳送點
-        if current_map_name != "map.tmx":
-            Logger.info(f"Currently on {current_map_name}, navigating to map.tmx teleporter first")
-            self._navigate_to_teleporter("map.tmx")
-            return
-        
-        # 在 map.tmx 上，導航到出生點
-        self.navigation_path = []
-        tile_size = GameSettings.TILE_SIZE
-        map_obj = self.game_manager.current_map
-        width = map_obj.tmxdata.width
-        height = map_obj.tmxdata.height
-
-        start = (self.game_manager.player.position.x // tile_size, self.game_manager.player.position.y // tile_size)
-        # Use loaded player position (from save) as goal if available, otherwise use map spawn
-        if getattr(self, 'loaded_player_spawn_pos', None) is not None:
-            goal = (self.loaded_player_spawn_pos.x // tile_size, self.loaded_player_spawn_pos.y // tile_size)
-        else:
-            goal = (map_obj.spawn.x // tile_size, map_obj.spawn.y // tile_size)
-
-        # Build blocked set from collision rectangles
-        blocked = set()
-        for rect in getattr(map_obj, '_collision_map', []):
-            bx = rect.x // tile_size
-            by = rect.y // tile_size
-            blocked.add((bx, by))
-        
-        # Add NPC positions to blocked set
-        for enemy in self.game_manager.current_enemy_trainers:
-            ex = int(enemy.position.x // tile_size)
-            ey = int(enemy.position.y // tile_size)
-            blocked.add((ex, ey))
-        for shop in self.game_manager.current_shop_managers:
-            sx = int(shop.position.x // tile_size)
-            sy = int(shop.position.y // tile_size)
-            blocked.add((sx, sy))
-
-        # BFS
-        q = deque([start])
-        prev: dict[tuple[int,int], tuple[int,int] | None] = {start: None}
-        found = False
-        while q:
-            x, y = q.popleft()
-            if (x, y) == goal:
-                found = True
-                break
-            for dx, dy in ((1,0),(-1,0),(0,1),(0,-1)):
-                nx, ny = x+dx, y+dy
-                if nx < 0 or ny < 0 or nx >= width or ny >= height:
-                    continue
-                if (nx, ny) in blocked:
-                    continue
-                if (nx, ny) in prev:
-                    continue
-                prev[(nx, ny)] = (x, y)
-                q.append((nx, ny))
-
-        if not found:
-            Logger.info("No path to spawn found")
-            return
-
-        # reconstruct path from goal to start
-        path = []
-        cur = goal
-        while cur is not None:
-            path.append(cur)
-            cur = prev.get(cur)
-        path.reverse()
-        self.navigation_path = path
-        
-        # 啟動自動導航
-        if len(self.navigation_path) > 0:
-            self.auto_navigation_active = True
-            self.navigation_current_index = 0
-            self.navigation_overlay_active = False  # 關閉導航覆蓋層
-            Logger.info(f"Auto navigation started with {len(self.navigation_path)} waypoints")
-        else:
-            self.navigation_final_goal = None  # 清除目標如果無法導航
+        self._start_route_navigation('start')
 
     def on_navigation_gym_click(self):
         Logger.info("Navigation gym clicked")
-        
-        if not self.game_manager.player or not self.game_manager.current_map:
-            return
-        
-        current_map_name = self.game_manager.current_map.path_name
-        
-        # 設置最終目標
-        self.navigation_final_goal = 'gym'
-        
-        # 如果已經在 gym.tmx 上，導航到出生點
-        if current_map_name == "gym.tmx":
-            Logger.info("Already on gym.tmx, navigating to spawn point")
-            self._navigate_to_spawn()
-        elif current_map_name == "map.tmx":
-            # 在 map.tmx 上，直接導航到 gym 傳送點
-            self._navigate_to_teleporter("gym.tmx")
-        else:
-            # 在其他地圖（new_map），先導航到返回 map.tmx 的傳送點
-            Logger.info(f"On {current_map_name}, need to go to map.tmx first")
-            self._navigate_to_teleporter("map.tmx")
+        self._start_route_navigation('gym')
 
     def on_navigation_new_world_click(self):
         Logger.info("Navigation new world clicked")
-        
-        if not self.game_manager.player or not self.game_manager.current_map:
-            return
-        
-        current_map_name = self.game_manager.current_map.path_name
-        
-        # 設置最終目標
-        self.navigation_final_goal = 'new_world'
-        
-        # 如果已經在 new_map.tmx 上，導航到出生點
-        if current_map_name == "new_map.tmx":
-            Logger.info("Already on new_map.tmx, navigating to spawn point")
-            self._navigate_to_spawn()
-        elif current_map_name == "map.tmx":
-            # 在 map.tmx 上，直接導航到 new_map 傳送點
-            self._navigate_to_teleporter("new_map.tmx")
-        else:
-            # 在其他地圖（gym），先導航到返回 map.tmx 的傳送點
-            Logger.info(f"On {current_map_name}, need to go to map.tmx first")
-            self._navigate_to_teleporter("map.tmx")
+        self._start_route_navigation('new_world')
     
-    
-    def _navigate_to_position(self, goal_tile: tuple[int, int]):
-        """導航到指定的格子位置"""
-        self.navigation_path = []
-        if not self.game_manager.player or not self.game_manager.current_map:
-            return
-        
+    def _navigation_target(self, goal_name: str) -> tuple[str, tuple[int, int]] | None:
+        """Map key and tile of a named navigation goal"""
         tile_size = GameSettings.TILE_SIZE
-        map_obj = self.game_manager.current_map
-        width = map_obj.tmxdata.width
-        height = map_obj.tmxdata.height
-        
-        start = (self.game_manager.player.position.x // tile_size, self.game_manager.player.position.y // tile_size)
-        goal = goal_tile
-        
-        # Build blocked set from collision rectangles
-        blocked = set()
-        for rect in getattr(map_obj, '_collision_map', []):
-            bx = rect.x // tile_size
-            by = rect.y // tile_size
-            blocked.add((bx, by))
-        
-        # Add NPC positions to blocked set
-        for enemy in self.game_manager.current_enemy_trainers:
-            ex = int(enemy.position.x // tile_size)
-            ey = int(enemy.position.y // tile_size)
-            blocked.add((ex, ey))
-        for shop in self.game_manager.current_shop_managers:
-            sx = int(shop.position.x // tile_size)
-            sy = int(shop.position.y // tile_size)
-            blocked.add((sx, sy))
-        
-        # BFS
-        q = deque([start])
-        prev: dict[tuple[int,int], tuple[int,int] | None] = {start: None}
-        found = False
-        while q:
-            x, y = q.popleft()
-            if (x, y) == goal:
-                found = True
-                break
-            for dx, dy in ((1,0),(-1,0),(0,1),(0,-1)):
-                nx, ny = x+dx, y+dy
-                if nx < 0 or ny < 0 or nx >= width or ny >= height:
-                    continue
-                if (nx, ny) in blocked:
-                    continue
-                if (nx, ny) in prev:
-                    continue
-                prev[(nx, ny)] = (x, y)
-                q.append((nx, ny))
-        
-        if not found:
-            Logger.info(f"No path to position {goal} found")
-            return
-        
-        # Reconstruct path from goal to start
-        path = []
-        cur = goal
-        while cur is not None:
-            path.append(cur)
-            cur = prev.get(cur)
-        path.reverse()
-        self.navigation_path = path
-        
-        # 啟動自動導航
-        if len(self.navigation_path) > 0:
-            self.auto_navigation_active = True
-            self.navigation_current_index = 0
-            Logger.info(f"Auto navigation to position {goal} started with {len(self.navigation_path)} waypoints")
+        if goal_name == 'start':
+            # Use loaded player position (from save) as goal if available, otherwise use map spawn
+            map_key = self.loaded_player_spawn_map
+            pos = self.loaded_player_spawn_pos
+        else:
+            map_key = {'gym': "gym.tmx", 'new_world': "new_map.tmx"}.get(goal_name)
+            pos = None
+        if map_key not in self.game_manager.maps:
+            return None
+        if pos is None:
+            pos = self.game_manager.maps.layout(map_key).spawn
+        return map_key, (int(pos.x // tile_size), int(pos.y // tile_size))
     
-    def _navigate_to_spawn(self):
-        """導航到當前地圖的出生點"""
-        self.navigation_path = []
-        if not self.game_manager.player or not self.game_manager.current_map:
-            return
-        
+    def _navigation_blockers(self, map_key: str) -> set[tuple[int, int]]:
+        """Tiles occupied by NPCs on the given map"""
         tile_size = GameSettings.TILE_SIZE
-        map_obj = self.game_manager.current_map
-        width = map_obj.tmxdata.width
-        height = map_obj.tmxdata.height
-        
-        start = (self.game_manager.player.position.x // tile_size, self.game_manager.player.position.y // tile_size)
-        goal = (map_obj.spawn.x // tile_size, map_obj.spawn.y // tile_size)
-        
-        # Build blocked set from collision rectangles
         blocked = set()
-        for rect in getattr(map_obj, '_collision_map', []):
-            bx = rect.x // tile_size
-            by = rect.y // tile_size
-            blocked.add((bx, by))
-        
-        # Add NPC positions to blocked set
-        for enemy in self.game_manager.current_enemy_trainers:
-            ex = int(enemy.position.x // tile_size)
-            ey = int(enemy.position.y // tile_size)
-            blocked.add((ex, ey))
-        for shop in self.game_manager.current_shop_managers:
-            sx = int(shop.position.x // tile_size)
-            sy = int(shop.position.y // tile_size)
-            blocked.add((sx, sy))
-        
-        # BFS
-        q = deque([start])
-        prev: dict[tuple[int,int], tuple[int,int] | None] = {start: None}
-        found = False
-        while q:
-            x, y = q.popleft()
-            if (x, y) == goal:
-                found = True
-                break
-            for dx, dy in ((1,0),(-1,0),(0,1),(0,-1)):
-                nx, ny = x+dx, y+dy
-                if nx < 0 or ny < 0 or nx >= width or ny >= height:
-                    continue
-                if (nx, ny) in blocked:
-                    continue
-                if (nx, ny) in prev:
-                    continue
-                prev[(nx, ny)] = (x, y)
-                q.append((nx, ny))
-        
-        if not found:
-            Logger.info("No path to spawn found")
-            return
-        
-        # Reconstruct path from goal to start
-        path = []
-        cur = goal
-        while cur is not None:
-            path.append(cur)
-            cur = prev.get(cur)
-        path.reverse()
-        self.navigation_path = path
-        
-        # 啟動自動導航
-        if len(self.navigation_path) > 0:
-            self.auto_navigation_active = True
-            self.navigation_current_index = 0
-            self.navigation_overlay_active = False
-            Logger.info(f"Auto navigation to spawn started with {len(self.navigation_path)} waypoints")
-        else:
-            self.navigation_final_goal = None  # 清除目標如果無法導航
+        for enemy in self.game_manager.enemy_trainers.get(map_key, []):
+            blocked.add((int(enemy.position.x // tile_size), int(enemy.position.y // tile_size)))
+        for shop in self.game_manager.shop_managers.get(map_key, []):
+            blocked.add((int(shop.position.x // tile_size), int(shop.position.y // tile_size)))
+        return blocked
     
-    def _navigate_to_teleporter(self, destination_map: str):
-        """通用方法：導航到指定目的地的傳送點"""
+    def _get_world_graph(self) -> WorldGraph:
+        """Build the route graph once per loaded save"""
+        if self.world_graph is None:
+            self.world_graph = WorldGraph(self.game_manager.maps, self.pathfinder)
+        return self.world_graph
+    
+    def _start_route_navigation(self, goal_name: str):
+        """Plan the full multi-map route to a named goal and start walking its first leg"""
         self.navigation_path = []
+        self.navigation_route = []
         if not self.game_manager.player or not self.game_manager.current_map:
             return
         
-        # Find teleporter with matching destination
-        target_teleporter = None
-        for tp in self.game_manager.current_map.teleporters:
-            if tp.destination == destination_map:
-                target_teleporter = tp
-                break
-        
-        if target_teleporter is None:
-            Logger.info(f"No teleporter to {destination_map} found on current map")
+        target = self._navigation_target(goal_name)
+        if target is None:
+            Logger.info(f"Unknown navigation goal {goal_name}")
+            self.navigation_final_goal = None
             return
+        goal_map, goal_tile = target
         
         tile_size = GameSettings.TILE_SIZE
-        map_obj = self.game_manager.current_map
-        width = map_obj.tmxdata.width
-        height = map_obj.tmxdata.height
-        
         start = (self.game_manager.player.position.x // tile_size, self.game_manager.player.position.y // tile_size)
-        goal = (target_teleporter.pos.x // tile_size, target_teleporter.pos.y // tile_size)
-        
-        # Build blocked set from collision rectangles
-        blocked = set()
-        for rect in getattr(map_obj, '_collision_map', []):
-            bx = rect.x // tile_size
-            by = rect.y // tile_size
-            blocked.add((bx, by))
-        
-        # Add NPC positions to blocked set
-        for enemy in self.game_manager.current_enemy_trainers:
-            ex = int(enemy.position.x // tile_size)
-            ey = int(enemy.position.y // tile_size)
-            blocked.add((ex, ey))
-        for shop in self.game_manager.current_shop_managers:
-            sx = int(shop.position.x // tile_size)
-            sy = int(shop.position.y // tile_size)
-            blocked.add((sx, sy))
-        
-        # BFS
-        q = deque([start])
-        prev: dict[tuple[int,int], tuple[int,int] | None] = {start: None}
-        found = False
-        while q:
-            x, y = q.popleft()
-            if (x, y) == goal:
-                found = True
-                break
-            for dx, dy in ((1,0),(-1,0),(0,1),(0,-1)):
-                nx, ny = x+dx, y+dy
-                if nx < 0 or ny < 0 or nx >= width or ny >= height:
-                    continue
-                if (nx, ny) in blocked:
-                    continue
-                if (nx, ny) in prev:
-                    continue
-                prev[(nx, ny)] = (x, y)
-                q.append((nx, ny))
-        
-        if not found:
-            Logger.info(f"No path to {destination_map} teleporter found")
+        blockers = {key: self._navigation_blockers(key) for key in self.game_manager.maps}
+        route = self._get_world_graph().find_route(
+            self.game_manager.current_map_key, start, goal_map, goal_tile, blockers
+        )
+        if not route:
+            Logger.info(f"No route to {goal_name} found")
+            self.navigation_final_goal = None
             return
         
-        # Reconstruct path from goal to start
-        path = []
-        cur = goal
-        while cur is not None:
-            path.append(cur)
-            cur = prev.get(cur)
-        path.reverse()
+        # 設置最終目標
+        self.navigation_final_goal = goal_name
+        self.navigation_route = route[1:]
+        self._begin_navigation_leg(route[0].path)
+        self.navigation_overlay_active = False  # 關閉導航覆蓋層
+        Logger.info(f"Auto navigation to {goal_name} started across {len(route)} map(s)")
+    
+    def _continue_route_navigation(self):
+        """Walk the next precomputed leg after a teleport, replan only if the player left the route"""
+        if self.navigation_route and self.navigation_route[0].map_key == self.game_manager.current_map_key:
+            leg = self.navigation_route.pop(0)
+            self._begin_navigation_leg(leg.path)
+            Logger.info(f"Continuing navigation to {self.navigation_final_goal} on {leg.map_key}")
+        else:
+            self._start_route_navigation(self.navigation_final_goal)
+    
+    def _begin_navigation_leg(self, path: list[tuple[int, int]]):
         self.navigation_path = path
-        
         # 啟動自動導航
         if len(self.navigation_path) > 0:
             self.auto_navigation_active = True
             self.navigation_current_index = 0
-            self.navigation_overlay_active = False  # 關閉導航覆蓋層
-            Logger.info(f"Auto navigation started to {destination_map} with {len(self.navigation_path)} waypoints")
     
     def on_bagpack_back_click(self):
         self.bagpack_overlay_active = False
@@ -728,6 +469,7 @@ class GameScene(Scene):
         loaded_manager = GameManager.load("saves/game0.json")
         if loaded_manager is not None:
             self.game_manager = loaded_manager
+            self.world_graph = None
             Logger.info("Game loaded successfully")
         else:
             Logger.warning("Failed to load game")
@@ -801,41 +543,10 @@ class GameScene(Scene):
         self._online_player_animations.clear()
         self._online_last_pos.clear()
         
-        # 檢查是否有待完成的導航目標（在傳送後繼續導航）
-        if self.navigation_final_goal and self.game_manager.player and self.game_manager.current_map:
-            current_map_name = self.game_manager.current_map.path_name
-            Logger.info(f"Continuing navigation to final goal: {self.navigation_final_goal} on map: {current_map_name}")
-            
-            if self.navigation_final_goal == 'start':
-                # 導航到 start（應該已經在 map.tmx 上）
-                if current_map_name == "map.tmx":
-                    # 使用 loaded_player_spawn_pos 或 spawn
-                    tile_size = GameSettings.TILE_SIZE
-                    if getattr(self, 'loaded_player_spawn_pos', None) is not None:
-                        goal = (self.loaded_player_spawn_pos.x // tile_size, self.loaded_player_spawn_pos.y // tile_size)
-                    else:
-                        goal = (self.game_manager.current_map.spawn.x // tile_size, self.game_manager.current_map.spawn.y // tile_size)
-                    Logger.info(f"Navigating to start position: {goal}")
-                    self._navigate_to_position(goal)
-                    # 只有在成功啟動導航後才清除 final_goal
-                    if self.auto_navigation_active:
-                        self.navigation_final_goal = None
-            elif self.navigation_final_goal == 'gym':
-                if current_map_name == "gym.tmx":
-                    self._navigate_to_spawn()
-                    if self.auto_navigation_active:
-                        self.navigation_final_goal = None
-                elif current_map_name == "map.tmx":
-                    # 還在 map.tmx，繼續導航到 gym 傳送點
-                    self._navigate_to_teleporter("gym.tmx")
-            elif self.navigation_final_goal == 'new_world':
-                if current_map_name == "new_map.tmx":
-                    self._navigate_to_spawn()
-                    if self.auto_navigation_active:
-                        self.navigation_final_goal = None
-                elif current_map_name == "map.tmx":
-                    # 還在 map.tmx，繼續導航到 new_map 傳送點
-                    self._navigate_to_teleporter("new_map.tmx")
+        # 檢查是否有待完成的導航目標（被戰鬥打斷後重新規劃路線）
+        if self.navigation_final_goal and not self.auto_navigation_active and self.game_manager.player:
+            Logger.info(f"Resuming navigation to final goal: {self.navigation_final_goal}")
+            self._start_route_navigation(self.navigation_final_goal)
         
         # If returning from bush battle, move player back one tile
         if self.player_pos_before_battle is not None and self.game_manager.player:
@@ -872,8 +583,11 @@ class GameScene(Scene):
         
     @override
     def update(self, dt: float):
+        # Remember the frame time for animations advanced in draw()
+        self._frame_dt = dt
         # Check if there is assigned next scene
         self.game_manager.try_switch_map()
+        self.game_manager.prefetch_maps()
         
         # 檢測地圖是否切換，如果有最終目標則繼續導航
         current_map_key = self.game_manager.current_map_key if self.game_manager.current_map else None
@@ -881,45 +595,9 @@ class GameScene(Scene):
             Logger.info(f"Map changed from {self.previous_map_key} to {current_map_key}")
             self.previous_map_key = current_map_key
             
-            # 如果有最終導航目標，繼續導航
-            if self.navigation_final_goal and self.game_manager.player and self.game_manager.current_map:
-                current_map_name = self.game_manager.current_map.path_name
-                Logger.info(f"Continuing navigation to final goal: {self.navigation_final_goal} on map: {current_map_name}")
-                
-                if self.navigation_final_goal == 'start':
-                    # 導航到 start（只能在 map.tmx 上）
-                    if current_map_name == "map.tmx":
-                        tile_size = GameSettings.TILE_SIZE
-                        if getattr(self, 'loaded_player_spawn_pos', None) is not None:
-                            goal = (self.loaded_player_spawn_pos.x // tile_size, self.loaded_player_spawn_pos.y // tile_size)
-                        else:
-                            goal = (self.game_manager.current_map.spawn.x // tile_size, self.game_manager.current_map.spawn.y // tile_size)
-                        Logger.info(f"Navigating to start position: {goal}")
-                        self._navigate_to_position(goal)
-                        if self.auto_navigation_active:
-                            self.navigation_final_goal = None
-                
-                elif self.navigation_final_goal == 'gym':
-                    if current_map_name == "gym.tmx":
-                        # 已經在 gym，導航到出生點
-                        self._navigate_to_spawn()
-                        if self.auto_navigation_active:
-                            self.navigation_final_goal = None
-                    elif current_map_name == "map.tmx":
-                        # 在 map 上，繼續導航到 gym 傳送點
-                        self._navigate_to_teleporter("gym.tmx")
-                    # 如果在其他地圖（new_map），不應該發生，因為應該先回到 map
-                
-                elif self.navigation_final_goal == 'new_world':
-                    if current_map_name == "new_map.tmx":
-                        # 已經在 new_map，導航到出生點
-                        self._navigate_to_spawn()
-                        if self.auto_navigation_active:
-                            self.navigation_final_goal = None
-                    elif current_map_name == "map.tmx":
-                        # 在 map 上，繼續導航到 new_map 傳送點
-                        self._navigate_to_teleporter("new_map.tmx")
-                    # 如果在其他地圖（gym），不應該發生，因為應該先回到 map
+            # 如果有最終導航目標，沿著預先規劃的路線繼續
+            if self.navigation_final_goal and self.game_manager.player:
+                self._continue_route_navigation()
         
         # Update player and other data
         if self.game_manager.player:
@@ -976,6 +654,7 @@ class GameScene(Scene):
             self._chat_overlay.update(dt)
         
         # Update chat bubbles from recent messages
+        profiler.begin("network")
         if self.online_manager:
             try:
                 msgs = self.online_manager.get_recent_chat(50)
@@ -994,6 +673,7 @@ class GameScene(Scene):
                 self._last_chat_id_seen = max_id
             except Exception:
                 pass
+        profiler.end()
         self.bagpack_button.update(dt)
         self.navigation_button.update(dt)
         if self.shop_overlay_active:
@@ -1074,11 +754,12 @@ class GameScene(Scene):
                     if input_manager.mouse_released(1):
                         self.slider_dragging = False
         if self.game_manager.player is not None and self.online_manager is not None:
-            _ = self.online_manager.update(
-                self.game_manager.player.position.x, 
-                self.game_manager.player.position.y,
-                self.game_manager.current_map.path_name
-            )
+            with profiler.section("network"):
+                _ = self.online_manager.update(
+                    self.game_manager.player.position.x, 
+                    self.game_manager.player.position.y,
+                    self.game_manager.current_map.path_name
+                )
         
     @override
     def draw(self, screen: pg.Surface):        
@@ -1092,7 +773,10 @@ class GameScene(Scene):
             camera = self.game_manager.player.camera
             '''
             camera = self.game_manager.player.camera
+            profiler.begin("map")
             self.game_manager.current_map.draw(screen, camera)
+            profiler.end()
+            profiler.begin("entities")
             # Draw navigation arrows if path exists (only show remaining path)
             if getattr(self, 'navigation_path', None) and self.nav_arrow_img is not None:
                 # scale arrow to fit tile
@@ -1114,13 +798,18 @@ class GameScene(Scene):
             self.game_manager.player.draw(screen, camera)
         else:
             camera = PositionCamera(0, 0)
+            profiler.begin("map")
             self.game_manager.current_map.draw(screen, camera)
+            profiler.end()
+            profiler.begin("entities")
         for enemy in self.game_manager.current_enemy_trainers:
             enemy.draw(screen, camera)
         
         for shop in self.game_manager.current_shop_managers:
             shop.draw(screen, camera)
+        profiler.end()
 
+        profiler.begin("ui")
         self.game_manager.bag.draw(screen)
         self.ingame_setting_button.draw(screen)
         self.bagpack_button.draw(screen)
@@ -1530,10 +1219,12 @@ class GameScene(Scene):
                     screen.blit(value_surf, (value_x, value_y))
         if self._chat_overlay:
             self._chat_overlay.draw(screen)
+        profiler.end()
         # Draw online players only if no overlay is active
         if not (self.overlay_active or self.bagpack_overlay_active or self.shop_overlay_active or self.navigation_overlay_active):
             if self.online_manager and self.game_manager.player:
-                list_online = self.online_manager.get_list_players()
+                profiler.begin("entities")
+                list_online = self.online_manager.get_interpolated_players()
                 # Get current online player IDs and clean up old data
                 current_online_ids = set()
                 for player in list_online:
@@ -1576,7 +1267,7 @@ class GameScene(Scene):
                         # Update and draw animation
                         anim = self._online_player_animations[player_id]
                         anim.update_pos(world_pos)
-                        anim.update(0.016)  # Approximate 60 FPS
+                        anim.update(self._frame_dt)
                         anim.draw(screen, cam)
                 
                 # Clean up disconnected players
@@ -1586,23 +1277,83 @@ class GameScene(Scene):
                 for pid in list(self._online_last_pos.keys()):
                     if pid not in current_online_ids:
                         del self._online_last_pos[pid]
+                profiler.end()
                 
                 try:
-                    self._draw_chat_bubbles(screen, self.game_manager.player.camera)
+                    with profiler.section("chat_bubbles"):
+                        self._draw_chat_bubbles(screen, self.game_manager.player.camera)
                 except Exception:
                     pass
         # Draw minimap only if no overlay is active
         if not (self.overlay_active or self.bagpack_overlay_active or self.shop_overlay_active or self.navigation_overlay_active):
-            self._draw_minimap(screen)
+            with profiler.section("minimap"):
+                self._draw_minimap(screen)
     
+    @override
+    def dirty_rects(self) -> list[pg.Rect] | None:
+        gm = self.game_manager
+        screen_rect = pg.Rect(0, 0, GameSettings.SCREEN_WIDTH, GameSettings.SCREEN_HEIGHT)
+        bag_open = self.bagpack_overlay_active or self.shop_overlay_active
+        panel_open = bag_open or self.overlay_active or self.navigation_overlay_active
+
+        # Map, entities, navigation arrows and minimap all follow the camera, so they share one layer
+        player = gm.player
+        camera = player.camera if player else PositionCamera(0, 0)
+        world = (
+            gm.current_map_key, camera.x, camera.y,
+            player.animation.frame_key() if player else None,
+            tuple((e.animation.frame_key(), e.detected, e.warning_sign.rect.topleft) for e in gm.current_enemy_trainers),
+            tuple((s.animation.frame_key(), s.can_interact, s.interaction_sign.rect.topleft) for s in gm.current_shop_managers),
+            self.navigation_current_index, len(self.navigation_path),
+        )
+        self._dirty.track("world", world, screen_rect)
+
+        # Opening or closing a panel dims or undims the whole screen
+        panels = (self.overlay_active, self.bagpack_overlay_active, self.shop_overlay_active, self.navigation_overlay_active)
+        self._dirty.track("backdrop", panels, screen_rect)
+        panel_rect = screen_rect
+        if panel_open and self.overlay_img is not None:
+            scale = 10 if bag_open else 5
+            panel_rect = pg.Rect(0, 0, self.overlay_img.get_width() * scale, self.overlay_img.get_height() * scale)
+            panel_rect.center = screen_rect.center
+        mouse = input_manager.mouse_pos
+        contents = (
+            self.current_page, self.checkbox_checked, self.slider_value,
+            repr(gm.bag.to_dict()) if self.bagpack_overlay_active else None,
+            repr(gm.shop_list.to_dict()) if self.shop_overlay_active else None,
+            # Shop buttons are rebuilt in draw(), only their hover state matters
+            tuple(b.hitbox.collidepoint(mouse) for b in self.shop_item_buttons) if self.shop_overlay_active else None,
+        )
+        self._dirty.track("panel", contents, panel_rect)
+
+        buttons = {
+            "setting": self.ingame_setting_button, "bagpack": self.bagpack_button, "navigation": self.navigation_button,
+            "back": self.back_button, "checkbox": self.checkbox_button, "save": self.save_button, "load": self.load_button,
+            "bagpack_back": self.bagpack_back_button, "shop_back": self.shop_back_button,
+            "next_page": self.next_page_button, "last_page": self.last_page_button,
+            "navigation_back": self.navigation_back_button, "navigation_start": self.navigation_start,
+            "navigation_gym": self.navigation_gym, "navigation_new_world": self.navigation_new_world,
+        }
+        for name, button in buttons.items():
+            self._dirty.track(name, button.img_button, button.hitbox)
+
+        if self._chat_overlay:
+            chat_rect = pg.Rect(0, GameSettings.SCREEN_HEIGHT - 100, GameSettings.SCREEN_WIDTH, 100)
+            self._dirty.track("chat", self._chat_overlay.frame_key(), chat_rect)
+
+        if self.online_manager and not panel_open:
+            # Online players and their chat bubbles are animated inside draw()
+            self._dirty.invalidate()
+        return self._dirty.collect()
+
     def _draw_minimap(self, screen: pg.Surface):
         """Draw a minimap in the top-right corner showing player position on the full map"""
         if not self.game_manager.player or not self.game_manager.current_map:
             return
         
         # Get map dimensions in pixels
-        map_width = self.game_manager.current_map.tmxdata.width * GameSettings.TILE_SIZE
-        map_height = self.game_manager.current_map.tmxdata.height * GameSettings.TILE_SIZE
+        map_width = self.game_manager.current_map.width * GameSettings.TILE_SIZE
+        map_height = self.game_manager.current_map.height * GameSettings.TILE_SIZE
         
         # Calculate minimap position (top-right corner)
         minimap_x = GameSettings.SCREEN_WIDTH - self.minimap_size - self.minimap_padding
@@ -1626,10 +1377,7 @@ class GameScene(Scene):
         screen.blit(minimap_bg, (minimap_x, minimap_y))
         
         # Scale and draw the map on the minimap
-        scaled_map = pg.transform.scale(
-            self.game_manager.current_map._surface,
-            (minimap_width, minimap_height)
-        )
+        scaled_map = self.game_manager.current_map.minimap((minimap_width, minimap_height))
         screen.blit(scaled_map, (minimap_x, minimap_y))
         
         # Draw border around minimap
@@ -1,6 +1,6 @@
 import pygame as pg
 
-from src.utils import GameSettings
+from src.utils import GameSettings, DirtyRegions
 from src.sprites import BackgroundSprite
 from src.scenes.scene import Scene
 from src.interface.components import Button
@@ -12,10 +12,13 @@ class MenuScene(Scene):
     background: BackgroundSprite
     # Buttons
     play_button: Button
+    # Dirty-rect tracking, see Engine.render
+    _dirty: DirtyRegions
     
     def __init__(self):
         super().__init__()
         self.background = BackgroundSprite("backgrounds/background1.png")
+        self._dirty = DirtyRegions()
 
         px, py = GameSettings.SCREEN_WIDTH // 2, GameSettings.SCREEN_HEIGHT * 3 // 4
         self.play_button = Button(
@@ -51,3 +54,10 @@ class MenuScene(Scene):
         self.background.draw(screen)
         self.play_button.draw(screen)
         self.setting_button.draw(screen)
+
+    @override
+    def dirty_rects(self) -> list[pg.Rect] | None:
+        # The background never changes, only the buttons' hover images do
+        self._dirty.track("play", self.play_button.img_button, self.play_button.hitbox)
+        self._dirty.track("setting", self.setting_button.img_button, self.setting_button.hitbox)
+        return self._dirty.collect()
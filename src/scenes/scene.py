@@ -15,4 +15,8 @@ class Scene:
         ...
 
     def draw(self, screen: pg.Surface) -> None:
-        ...
\ No newline at end of file
+        ...
+
+    def dirty_rects(self) -> list[pg.Rect] | None:
+        """Screen areas that changed since the last draw, None to redraw everything"""
+        return None
\ No newline at end of file
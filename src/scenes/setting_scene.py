@@ -5,7 +5,7 @@ Try to mimic the menu_scene.py or game_scene.py to create this new scene
 import pygame as pg
 
 from src.scenes.scene import Scene
-from src.utils import GameSettings
+from src.utils import GameSettings, DirtyRegions
 from src.sprites import BackgroundSprite, Sprite
 from src.interface.components import Button
 from src.core.services import scene_manager, input_manager
@@ -14,10 +14,12 @@ from typing import override
 class SettingScene(Scene):
     background: BackgroundSprite
     back_button: Button
+    _dirty: DirtyRegions
 
     def __init__(self):
         super().__init__()
         self.background = BackgroundSprite("backgrounds/background1.png")
+        self._dirty = DirtyRegions()
 
         px, py = GameSettings.SCREEN_WIDTH // 2, GameSettings.SCREEN_HEIGHT * 3 // 4
         self.back_button = Button(
@@ -200,4 +202,17 @@ class SettingScene(Scene):
             self.back_button.draw(screen)
         else:
             # if overlay not active, draw back_button normally
-            self.back_button.draw(screen)
\ No newline at end of file
+            self.back_button.draw(screen)
+
+    @override
+    def dirty_rects(self) -> list[pg.Rect] | None:
+        screen_rect = pg.Rect(0, 0, GameSettings.SCREEN_WIDTH, GameSettings.SCREEN_HEIGHT)
+        panel_rect = screen_rect
+        if self.overlay_img is not None:
+            panel_rect = pg.Rect(0, 0, self.overlay_img.get_width() * self.overlay_scale, self.overlay_img.get_height() * self.overlay_scale)
+            panel_rect.center = screen_rect.center
+        # Labels, slider and checkbox all live inside the overlay frame
+        panel = (self.overlay_active, self.checkbox_checked, self.slider_value, self.checkbox_button.img_button)
+        self._dirty.track("panel", panel, panel_rect)
+        self._dirty.track("back", self.back_button.img_button, self.back_button.hitbox)
+        return self._dirty.collect()
\ No newline at end of file
@@ -52,6 +52,11 @@ class Animation(Sprite):
     def update(self, dt: float):
          self.accumulator = (self.accumulator + dt) % self.loop
         
+    def frame_key(self) -> tuple:
+        """What draw() would show right now: row, keyframe and position"""
+        idx = int((self.accumulator / self.loop) * self.n_keyframes)
+        return (self.cur_row, idx, self.rect.x, self.rect.y)
+
     def draw(self, screen: pg.Surface, camera: Optional[PositionCamera] = None):
         frames = self.animations[self.cur_row]
         idx = int((self.accumulator / self.loop) * self.n_keyframes)
@@ -2,13 +2,15 @@
 
 from .logger import Logger
 from .settings import GameSettings
-from .loader import load_tmx, load_img, load_font, load_sound
+from .loader import load_tmx, parse_tmx, load_img, load_font, load_sound
 from .definition import Position, PositionCamera, Direction, MouseBtn, Key, Teleport
+from .dirty_regions import DirtyRegions
 
 __all__ = [
     "Logger",
     "GameSettings",
     "load_tmx",
+    "parse_tmx",
     "load_img",
     "load_font",
     "load_sound",
@@ -18,4 +20,5 @@ __all__ = [
     "MouseBtn",
     "Key",
     "Teleport",
+    "DirtyRegions",
 ]
\ No newline at end of file
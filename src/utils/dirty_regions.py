@@ -0,0 +1,48 @@
+import pygame as pg
+from typing import Hashable
+
+
+class DirtyRegions:
+    """
+    Remembers what each drawing layer of a scene showed last frame and where,
+    and reports the screen areas that changed since
+
+    A layer is anything drawn as a unit (a button, a panel, the whole world view).
+    Its state is any hashable value that changes whenever its pixels would.
+    """
+    _layers: dict[str, tuple[Hashable, pg.Rect]]
+    _rects: list[pg.Rect]
+    _full: bool
+
+    def __init__(self) -> None:
+        self._layers = {}
+        self._rects = []
+        self._full = True
+
+    def track(self, layer: str, state: Hashable, rect: pg.Rect) -> None:
+        """Record what a layer draws this frame, marking its old and new area dirty if it changed"""
+        previous = self._layers.get(layer)
+        if previous is not None and previous[0] == state and previous[1] == rect:
+            return
+        if previous is not None:
+            self._rects.append(previous[1])
+        self._rects.append(pg.Rect(rect))
+        self._layers[layer] = (state, pg.Rect(rect))
+
+    def forget(self, layer: str) -> None:
+        """A layer that is no longer drawn, the area it covered needs redrawing"""
+        previous = self._layers.pop(layer, None)
+        if previous is not None:
+            self._rects.append(previous[1])
+
+    def invalidate(self) -> None:
+        """Redraw the whole screen next frame"""
+        self._full = True
+
+    def collect(self) -> list[pg.Rect] | None:
+        """The areas that changed since the last call, None when everything must be redrawn"""
+        rects, self._rects = self._rects, []
+        if self._full:
+            self._full = False
+            return None
+        return rects
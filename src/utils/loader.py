@@ -1,5 +1,6 @@
 import pygame as pg
 from pytmx import load_pygame, TiledMap
+from pytmx.util_pygame import handle_transformation
 from pathlib import Path
 from .logger import Logger
 
@@ -31,3 +32,28 @@ def load_tmx(path: str) -> TiledMap:
     if tmxdata is None:
         Logger.error(f"Failed to load map: {path}")
     return tmxdata
+
+def _plain_image_loader(filename: str, colorkey: str | None, **kwargs):
+    """pytmx image loader that keeps tiles in their file format, no display needed"""
+    image = pg.image.load(filename)
+
+    def load_image(rect=None, flags=None) -> pg.Surface:
+        tile = image.subsurface(rect) if rect else image
+        if flags:
+            tile = handle_transformation(tile, flags)
+        if colorkey:
+            # Bake the colorkey into per-pixel alpha instead of relying on convert()
+            keyed = tile.copy()
+            keyed.set_colorkey(pg.Color(f"#{colorkey}"))
+            tile = pg.Surface(tile.get_size(), pg.SRCALPHA)
+            tile.blit(keyed, (0, 0))
+        return tile
+
+    return load_image
+
+def parse_tmx(path: str) -> TiledMap:
+    """Like load_tmx, but leaves the tiles unconverted so it can run off the main thread"""
+    tmxdata = TiledMap(str(ASSETS_DIR / "maps" / path), image_loader=_plain_image_loader)
+    if tmxdata is None:
+        Logger.error(f"Failed to load map: {path}")
+    return tmxdata
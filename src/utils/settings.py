@@ -10,11 +10,19 @@ class Settings:
     DEBUG: bool = True          # Debug mode
     TILE_SIZE: int = 64         # Size of each tile in pixels
     DRAW_HITBOXES: bool = True  # Draw hitboxes for debugging
+    DIRTY_RECTS: bool = False   # Only redraw and present the parts of the screen that changed
+    PROFILER: bool = False      # Time each part of the frame, F3 toggles the overlay, F4 writes a trace
+    PROFILER_TRACE: str = "profile_trace.json"  # Chrome trace written by F4 and on exit
+    MAP_CHUNK_TILES: int = 8    # Maps are baked lazily in square chunks of this many tiles
+    MAP_CHUNK_CACHE: int = 24   # Baked chunks kept per map, least recently drawn are dropped first
+    MAP_GRAPHICS_CACHE: int = 2 # Recently visited maps that keep their baked chunks
+    MAP_PREFETCH_DISTANCE: int = 6  # Tiles from a teleporter at which its destination starts loading
     # Audio
     MAX_CHANNELS: int = 16
     AUDIO_VOLUME: float = 0.5   # Volume of audio
     # Online
     IS_ONLINE: bool = True
     ONLINE_SERVER_URL: str = "http://localhost:8989"
+    ONLINE_BINARY_PROTOCOL: bool = True    # Offer compact binary position frames, JSON is the fallback
     
 GameSettings = Settings()
\ No newline at end of file